@@ -0,0 +1,107 @@
+'''
+Per-actuator calibration of the duty and frequency mapping.
+
+LRA, VCA and M actuators respond differently to the same command, so each actuator type (and
+optionally each single actuator) can carry a calibration table:
+    {
+        "duty_curve": [[0.0, 0], [0.5, 9], [1.0, 15]],   # perceived intensity -> duty (interpolated)
+        "frequency_set": [110, 140, 165, 200, 240, 280, 330, 390]   # measured output of freq index 0..7
+    }
+The tables are stored with the design as {"types": {type: table}, "actuators": {actuator_id: table}},
+an actuator table overriding its type table. Before playback they are compiled into small NumPy
+lookup arrays (applied by playback_engine.quantize_calibrated), so calibration costs one array
+gather per batch of samples.
+'''
+
+import numpy as np
+
+from playback_engine import FREQUENCY_SET
+
+# Resolution of the intensity lookup (amplitude 0..1 is mapped to 0..DUTY_LUT_SIZE-1)
+DUTY_LUT_SIZE = 256
+# The frequency lookup covers 0..FREQUENCY_LUT_SIZE-1 Hz with 1 Hz steps
+FREQUENCY_LUT_SIZE = 1024
+
+# Same behaviour as the uncalibrated HapticCommandManager mapping
+DEFAULT_TABLE = {
+    "duty_curve": [[0.0, 0], [1.0, 15]],
+    "frequency_set": FREQUENCY_SET.tolist(),
+}
+
+
+def normalize_type(actuator_type):
+    """Actuator types are stored as "LRA", "VCA", "M" or "M  " depending on where they were set."""
+    return actuator_type.strip()
+
+
+def table_for(calibration, actuator_id, actuator_type):
+    """Calibration table of one actuator: its own table, else the one of its type, else None."""
+    if not calibration:
+        return None
+    table = calibration.get("actuators", {}).get(actuator_id)
+    if table is None:
+        table = calibration.get("types", {}).get(normalize_type(actuator_type))
+    return table
+
+
+def build_duty_lut(table):
+    """Lookup array: amplitude index (0..DUTY_LUT_SIZE-1) -> duty (0..15)."""
+    curve = np.array(table.get("duty_curve", DEFAULT_TABLE["duty_curve"]), dtype=np.float64)
+    curve = curve[np.argsort(curve[:, 0])]
+    intensities = np.linspace(0, 1, DUTY_LUT_SIZE)
+    duty = np.interp(intensities, curve[:, 0], curve[:, 1])
+    lut = np.clip(np.rint(duty), 0, 15).astype(np.uint8)
+    lut.setflags(write=False)
+    return lut
+
+
+def build_frequency_lut(table):
+    """Lookup array: target frequency in Hz (0..FREQUENCY_LUT_SIZE-1) -> freq index whose measured output is closest."""
+    frequency_set = np.array(table.get("frequency_set", DEFAULT_TABLE["frequency_set"]), dtype=np.float64)
+    targets = np.arange(FREQUENCY_LUT_SIZE, dtype=np.float64)
+    lut = np.argmin(np.abs(targets[:, None] - frequency_set), axis=1).astype(np.uint8)
+    lut.setflags(write=False)
+    return lut
+
+
+def compile_calibration(calibration, actuator_types):
+    """
+    Compile the calibration for every actuator ({actuator_id: type}).
+    Returns {actuator_id: (duty_lut, frequency_lut)} for calibrated actuators only; uncalibrated
+    actuators keep the exact default quantization.
+    """
+    luts = {}
+    compiled_tables = {}  # Actuators sharing a table share the arrays
+    for actuator_id, actuator_type in actuator_types.items():
+        table = table_for(calibration, actuator_id, actuator_type)
+        if table is None:
+            continue
+        if id(table) not in compiled_tables:
+            compiled_tables[id(table)] = (build_duty_lut(table), build_frequency_lut(table))
+        luts[actuator_id] = compiled_tables[id(table)]
+    return luts
+
+
+def format_table(table):
+    """Text form used by the calibration dialog."""
+    curve = ", ".join(f"{intensity:g}:{duty:g}" for intensity, duty in table["duty_curve"])
+    frequencies = ", ".join(f"{frequency:g}" for frequency in table["frequency_set"])
+    return curve, frequencies
+
+
+def parse_table(curve_text, frequency_text):
+    """Parse the dialog text back into a table, raising ValueError on malformed input."""
+    curve = []
+    for point in curve_text.split(","):
+        intensity, duty = point.split(":")
+        intensity, duty = float(intensity), float(duty)
+        if not (0 <= intensity <= 1 and 0 <= duty <= 15):
+            raise ValueError(f"Point {point.strip()} is outside intensity [0, 1] / duty [0, 15]")
+        curve.append([intensity, duty])
+    if len(curve) < 2:
+        raise ValueError("The intensity curve needs at least two points")
+
+    frequency_set = [float(frequency) for frequency in frequency_text.split(",")]
+    if len(frequency_set) != len(FREQUENCY_SET):
+        raise ValueError(f"The frequency set needs exactly {len(FREQUENCY_SET)} values")
+    return {"duty_curve": curve, "frequency_set": frequency_set}
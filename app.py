@@ -11,6 +11,7 @@ import random
 import time
 import pickle
 import csv
+import uuid
 from scipy import signal
 import numpy as np
 
@@ -21,9 +22,18 @@ matplotlib.use('QtAgg')
 from matplotlib.colors import to_rgba
 
 from python_ble_api import python_ble_api
-from signal_segmentation_api import signal_segmentation_api
+from signal_segmentation_api import signal_segmentation_api, MODE_STFT, MODE_GOERTZEL, DEFAULT_FFT_WORKERS
 from utils import *
-from timeline_timer import TimelineTimer
+from playback_engine import snapshot_design, BLEND_MODES, DEFAULT_CONTROL_RATE, MAX_CONTROL_RATE
+from playback_worker import PlaybackWorker
+from haptic_commands import HapticCommandManager
+from clip_index import ClipIndex
+from segmentation_cache import SegmentationCache
+from signal_precision import PRECISION_DOUBLE, PRECISION_SINGLE, sample_dtype, to_storage, storage_precision, placeholder_track
+from segmentation_task import SegmentationTask
+from clip_tracks import TRACK_RATE, QUANTIZED_TRACKS, track_length, track_rate, slice_track, display_track, quantize_tracks, migrate_clip, migrate_signals
+from batch_segmentation import BatchSegmentationTask, available_cores
+from actuator_calibration import compile_calibration, table_for, format_table, parse_table, normalize_type, DEFAULT_TABLE
 from signal_generator import OscillatorDialog, ChirpDialog, NoiseDialog, FMDialog, PWMDialog
 from drone_grid_window import DroneGridWindow
 from drone_3d_grid import Drone3DWindow
@@ -198,97 +208,6 @@ class BluetoothConnectDialog(QtWidgets.QDialog):
         else:
             self.status_label.setText("Disconnection cancelled.")
 
-class HapticCommandManager:
-    def __init__(self, ble_api):
-        self.ble_api = ble_api
-        self.is_playing = False
-        self.CHAIN_JUMP_INDEX = 16
-        self.active_actuators = set()
-        self.last_sent_commands = [] # for the end of the slider use
-
-
-    def detect_leaving_edges(self, current_amplitudes):
-        current_actuators = set(current_amplitudes.keys())
-        leaving_edges = self.active_actuators - current_actuators
-        stop_commands = [
-            self.prepare_command(actuator_id, 0, 0, 0)  # Prepare stop command
-            for actuator_id in leaving_edges
-        ]
-        self.active_actuators = current_actuators
-        return stop_commands
-
-    def actuator_id_to_addr(self, actuator_id):
-        chain, index = actuator_id.split('.')
-        return (ord(chain) - ord('A')) * self.CHAIN_JUMP_INDEX + int(index) - 1
-
-    def map_amplitude_to_duty(self, amplitude):
-        # Map amplitude from 0 to 1 to 0 to 15
-        return int(round(amplitude * 15))
-
-
-    def map_frequency_to_freq_param(self, frequency):
-        # Define the frequency set
-        frequency_set = [123, 145, 170, 200, 235, 275, 322, 384]
-        
-        # Find the closest frequency in the set
-        closest_freq = min(frequency_set, key=lambda x: abs(x - frequency))
-        
-        # Return the index of the closest frequency
-        return frequency_set.index(closest_freq)
-
-    def prepare_command(self, actuator_id, amplitude, frequency, start_or_stop=1):
-        return {
-            'addr': self.actuator_id_to_addr(actuator_id),
-            'duty': self.map_amplitude_to_duty(amplitude),
-            'freq': self.map_frequency_to_freq_param(frequency),
-            'start_or_stop': start_or_stop
-        }  # 1 for start
-
-    def process_commands(self, commands):
-        commands.sort(key=lambda cmd: cmd["addr"])
-        if commands != None and self.is_playing:
-            self.ble_api.send_command_list(commands)  # Send the list of commands
-            self.last_sent_commands = commands  # Log the last sent commands
-            print(f"Sending command list at Time {time.perf_counter()}: {commands}")
-
-    def start_playback(self):
-        self.is_playing = True
-
-    def stop_playback(self):
-        self.is_playing = False
-        # Generate stop commands for all active actuators based on the current active signals
-        stop_commands = [
-            {"addr": self.actuator_id_to_addr(actuator_id), "duty": 0, "freq": 0, "start_or_stop": 0}
-            for actuator_id in self.active_actuators
-        ]
-        # sort the stop_commands by addr in a increasing order
-        stop_commands.sort(key=lambda cmd: cmd["addr"])
-        
-        # Send STOP commands to the actuators
-        if stop_commands:
-            self.ble_api.send_command_list(stop_commands)  # Send the list of stop commands
-            self.last_sent_commands = stop_commands  # Log the last sent stop commands
-            current_time = time.time()
-            print(f"[Play Button Stopping] Sending stop command list at {current_time}: {stop_commands}")
-        
-        # Clear active actuators and active signals after sending the stop commands
-        self.active_actuators.clear()
-
-
-    def update(self, current_amplitudes):
-        """Update the playing signals if there is a change."""
-        # Detect leaving edges and generate stop commands
-        stop_commands = self.detect_leaving_edges(current_amplitudes)
-
-        # Prepare all commands for active actuators, ensuring we handle None parameters safely
-        active_commands = []
-        for actuator_id, signal_details in current_amplitudes.items():
-            active_commands.append(self.prepare_command(actuator_id, signal_details["current_amplitude"], signal_details["current_frequency"], 1))
-
-        all_commands = stop_commands + active_commands
-        # Process the commands (not time-guarded)
-        self.process_commands(all_commands)
-
 class DesignSaver:
     def __init__(self, actuator_canvas, timeline_canvases, mpl_canvas, app_reference):
         self.actuator_canvas = actuator_canvas
@@ -324,8 +243,9 @@ class DesignSaver:
                     'branch_colors': self.actuator_canvas.branch_colors,
                     'mpl_canvas_data': self.collect_mpl_canvas_data(),
                     'current_actuator': self.app_reference.current_actuator,
-                    'actuator_signals': self.app_reference.actuator_signals,
+                    'actuator_signals': self.saved_signals(),
                     'tree_widget_data': self.collect_tree_widget_data(),
+                    'calibration': self.app_reference.actuator_calibration,
                 }
 
                 with open(file_name, 'wb') as file:
@@ -345,6 +265,7 @@ class DesignSaver:
                     design_data = pickle.load(file)
 
                 self.app_reference.clear_canvas_and_timeline(bypass_dialog=True)
+                self.app_reference.cancel_segmentation()  # The imported signals are replaced as well
                 
                 self.apply_actuator_data(design_data['actuators'])
                 self.apply_timeline_data(design_data['timeline'])
@@ -353,8 +274,11 @@ class DesignSaver:
                 self.actuator_canvas.branch_colors = design_data.get('branch_colors', {})
                 self.apply_mpl_canvas_data(design_data.get('mpl_canvas_data', {}))
                 self.app_reference.current_actuator = design_data.get('current_actuator')
-                self.app_reference.actuator_signals = design_data.get('actuator_signals', {})
+                self.app_reference.actuator_signals = migrate_signals(design_data.get('actuator_signals', {}))
+                self.app_reference.request_missing_tracks()
+                self.app_reference.clips_changed()
                 self.apply_tree_widget_data(design_data.get('tree_widget_data', {}))
+                self.app_reference.actuator_calibration = design_data.get('calibration', {"types": {}, "actuators": {}})
 
                 self.actuator_canvas.redraw_all_lines()
                 
@@ -425,6 +349,22 @@ class DesignSaver:
             'successor': actuator.successor
         } for actuator in self.actuator_canvas.actuators]
 
+    @staticmethod
+    def saved_clip(signal):
+        """
+        A clip as written to a design file: a clip still being analyzed is saved without its task id
+        and placeholder tracks (None), load_design segments it again.
+        """
+        if "pending" not in signal:
+            return signal
+        clip = {name: value for name, value in signal.items() if name not in ("pending", "pending_start")}
+        clip.update(dict.fromkeys(("high_freq", "low_freq") + QUANTIZED_TRACKS))
+        return clip
+
+    def saved_signals(self):
+        return {actuator_id: [self.saved_clip(signal) for signal in signals]
+                for actuator_id, signals in self.app_reference.actuator_signals.items()}
+
     def collect_timeline_data(self):
         timeline_data = []
         for actuator_id, timeline_canvas in self.timeline_canvases.items():
@@ -436,8 +376,13 @@ class DesignSaver:
                 'data': signal["data"],  # Original signal data
                 'high_freq': signal.get("high_freq", None),  # high frequency data
                 'low_freq': signal.get("low_freq", None),    # low frequency data
-                'parameters': signal["parameters"]
-            } for signal in timeline_canvas.signals])
+                'track_rate': track_rate(signal),  # samples per second of the high/low frequency tracks
+                'duty': signal.get("duty", None),  # pre-quantized duty track (uint8 0-15)
+                'freq_index': signal.get("freq_index", None),  # pre-quantized frequency index track (uint8 0-7)
+                'parameters': signal["parameters"],
+                'layer': signal.get("layer", 0),  # stacking order of overlapping clips
+                'blend': signal.get("blend", "max")  # how the clip mixes with the layers below
+            } for signal in map(self.saved_clip, timeline_canvas.signals)])
         return timeline_data
 
 
@@ -466,15 +411,22 @@ class DesignSaver:
                 self.app_reference.actuator_signals[actuator_id] = []
             
             # Load signal data, including high and low frequency components
-            self.app_reference.actuator_signals[actuator_id].append({
+            clip = {
                 'type': signal_info['type'],
                 'start_time': signal_info['start_time'],
                 'stop_time': signal_info['stop_time'],
                 'data': signal_info['data'],  # Original data
                 'high_freq': signal_info.get('high_freq', None),  # High frequency data
                 'low_freq': signal_info.get('low_freq', None),    # Low frequency data
-                'parameters': signal_info['parameters']
-            })
+                'parameters': signal_info['parameters'],
+                'layer': signal_info.get('layer', 0),
+                'blend': signal_info.get('blend', 'max')
+            }
+            for name in ('track_rate',) + QUANTIZED_TRACKS:
+                if signal_info.get(name) is not None:
+                    clip[name] = signal_info[name]
+            # Designs saved with 44.1 kHz tracks or without quantized tracks are brought up to date
+            self.app_reference.actuator_signals[actuator_id].append(migrate_clip(clip))
 
         # Apply the signals to the timeline canvases
         for actuator_id, signals in self.app_reference.actuator_signals.items():
@@ -683,7 +635,7 @@ class MplCanvas(FigureCanvas):
             data = (2 * np.abs(2 * (t * frequency - np.floor(t * frequency + 0.5))) - 1)
         else:
             data = np.zeros_like(t)  # Default for unsupported types
-        data = (amplitude * data).tolist()
+        data = to_storage(amplitude * data, self.app_reference.signal_precision)
         return self.formatting_data(signal_type, data)
 
     def generate_custom_chirp_json(self, signal_type, chirp_type, frequency, amplitude, rate, duration):
@@ -707,14 +659,14 @@ class MplCanvas(FigureCanvas):
             data = signal.sawtooth(2 * np.pi * np.cumsum(instantaneous_frequency) / TIME_STAMP, 0.5)
         else:
             data = np.zeros_like(t)  # Default for unsupported types
-        data = (amplitude * data).tolist()
+        data = to_storage(amplitude * data, self.app_reference.signal_precision)
         return self.formatting_data(signal_type, data)
     
     def generate_custom_noise_json(self, signal_type, amplitude, duration):
         t = np.linspace(0, duration, int(TIME_STAMP * duration))
         # generate random noise between -1 and 1
         data = np.random.uniform(-1, 1, len(t))
-        data = (amplitude * data).tolist()
+        data = to_storage(amplitude * data, self.app_reference.signal_precision)
         return self.formatting_data(signal_type, data)
 
     def generate_custom_FM_json(self, signal_type, FM_type, frequency, amplitude, modulation, index, duration):
@@ -738,7 +690,7 @@ class MplCanvas(FigureCanvas):
             data = signal.sawtooth(instantaneous_phase, 0.5)
         else:
             data = np.zeros_like(t)  # Default for unsupported types
-        data = (amplitude * data).tolist()
+        data = to_storage(amplitude * data, self.app_reference.signal_precision)
         return self.formatting_data(signal_type, data)
         
     def generate_custom_PWM_json(self, signal_type, frequency, amplitude, duty_cycle, duration):
@@ -746,7 +698,7 @@ class MplCanvas(FigureCanvas):
         t = np.linspace(0, duration, int(TIME_STAMP * duration))
         # generate PWM signal
         data = signal.square(2 * np.pi * frequency * t, duty_cycle/100)
-        data = (amplitude * data).tolist()
+        data = to_storage(amplitude * data, self.app_reference.signal_precision)
         return self.formatting_data(signal_type, data)
     
     def formatting_data(self, signal_type, data):
@@ -1138,9 +1090,16 @@ class ActuatorCanvas(QGraphicsView):
         self.last_pan_point = QPointF()
         self.actuator_size = 20
 
+        # Actuators currently highlighted as playing, toggled incrementally by apply_highlight
+        self.highlighted_ids = set()
+        self.batching_selection = False
         self.scene.selectionChanged.connect(self.handle_selection_change)
 
     def handle_selection_change(self):
+        if self.batching_selection:
+            return  # apply_highlight repaints the few actuators it toggled itself
+        self.highlighted_ids = {item.id for item in self.scene.selectedItems() if isinstance(item, Actuator)}
+
         # Force an update on the scene to repaint the actuators
         for item in self.scene.selectedItems():
             item.update()  # Ensure selected items are redrawn
@@ -1477,10 +1436,13 @@ class ActuatorCanvas(QGraphicsView):
         edit_action = menu.addAction("Edit Properties")
         delete_action = menu.addAction("Delete")
         clear_signal_action = menu.addAction("Clear Signal")
+        calibrate_action = menu.addAction("Calibrate...")
 
         action = menu.exec(self.mapToGlobal(pos))
         if action == edit_action:
             self.edit_actuator_properties(actuator)
+        elif action == calibrate_action:
+            self.calibrate_actuator(actuator)
         elif action == delete_action:
             selected_items = self.scene.selectedItems()
             if selected_items:
@@ -1497,6 +1459,7 @@ class ActuatorCanvas(QGraphicsView):
         actuator_id = actuator.id
         if actuator_id in self.haptics_app.actuator_signals:
             del self.haptics_app.actuator_signals[actuator_id]  # Remove the signal from the dictionary
+            self.haptics_app.clips_changed(actuator_id)
 
         # Update the pushButton_5 state to reflect the change in signals
         self.haptics_app.update_pushButton_5_state()
@@ -1506,6 +1469,24 @@ class ActuatorCanvas(QGraphicsView):
         self.haptics_app.update_actuator_text()
 
 
+    def calibrate_actuator(self, actuator):
+        """Edit the calibration table of an actuator, or of every actuator of its type."""
+        calibration = self.haptics_app.actuator_calibration
+        table = table_for(calibration, actuator.id, actuator.actuator_type) or DEFAULT_TABLE
+        dialog = CalibrationDialog(actuator, table, self)
+        while dialog.exec() == QDialog.DialogCode.Accepted:
+            try:
+                new_table = parse_table(dialog.curve_input.text(), dialog.frequency_input.text())
+            except ValueError as e:
+                QMessageBox.warning(self, "Invalid Calibration", f"Could not read the calibration table: {e}")
+                continue  # Reopen the dialog for the user to fix the input
+            if dialog.apply_to_type_checkbox.isChecked():
+                calibration.setdefault("types", {})[normalize_type(actuator.actuator_type)] = new_table
+                calibration.setdefault("actuators", {}).pop(actuator.id, None)
+            else:
+                calibration.setdefault("actuators", {})[actuator.id] = new_table
+            break
+
     def edit_actuator_properties(self, actuator):
         dialog = ActuatorPropertiesDialog(actuator, self)
         while True:
@@ -1695,14 +1676,37 @@ class ActuatorCanvas(QGraphicsView):
                 self.scene.removeItem(item)
 
     def highlight_actuators_at_time(self, time_position):
-        for actuator in self.actuators:
-            signals = self.haptics_app.actuator_signals.get(actuator.id, [])
-            is_active = any(signal["start_time"] <= time_position <= signal["stop_time"] for signal in signals)
-            if is_active:
-                actuator.setSelected(True)  # Highlight the actuator
-            else:
-                actuator.setSelected(False)  # Remove highlight
-        self.update()  # Ensure the canvas is updated
+        signals = self.haptics_app.actuator_signals
+        clip_index = self.haptics_app.clip_index
+        self.apply_highlight({
+            actuator_id for actuator_id, actuator_signals in signals.items()
+            if clip_index.is_active(actuator_id, actuator_signals, time_position)
+        })
+
+    def set_highlighted_actuators(self, active_ids):
+        """Highlight exactly the actuators reported as running by the playback worker."""
+        self.apply_highlight(set(active_ids))
+
+    def apply_highlight(self, active_ids):
+        """
+        Highlight the actuators in active_ids, toggling only those that entered or left the highlighted set.
+        Scene selection handling is suspended meanwhile and only the toggled actuators are repainted.
+        """
+        entered = active_ids - self.highlighted_ids
+        left = self.highlighted_ids - active_ids
+        if not entered and not left:
+            return
+        actuators = {actuator.id: actuator for actuator in self.actuators}
+        self.batching_selection = True
+        try:
+            for actuator_id in entered | left:
+                actuator = actuators.get(actuator_id)
+                if actuator is not None:
+                    actuator.setSelected(actuator_id in entered)
+                    actuator.update()  # Repaints the bounding rect of this actuator only
+        finally:
+            self.batching_selection = False
+        self.highlighted_ids = active_ids & actuators.keys()
 
 class SelectionBarView(QGraphicsView):
     def __init__(self, scene, parent=None):
@@ -1820,6 +1824,31 @@ class ActuatorPropertiesDialog(QDialog):
         else:
             return ""
 
+class CalibrationDialog(QDialog):
+    def __init__(self, actuator, table, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(f"Calibrate {actuator.id}")
+        layout = QVBoxLayout(self)
+
+        curve_text, frequency_text = format_table(table)
+        form_layout = QFormLayout()
+        self.curve_input = QLineEdit(curve_text)
+        self.curve_input.setToolTip("Perceived intensity (0-1) : duty (0-15) pairs, e.g. 0:0, 0.5:9, 1:15")
+        form_layout.addRow("Intensity curve:", self.curve_input)
+
+        self.frequency_input = QLineEdit(frequency_text)
+        self.frequency_input.setToolTip("Measured output frequency (Hz) of freq index 0 to 7")
+        form_layout.addRow("Frequency set (Hz):", self.frequency_input)
+
+        self.apply_to_type_checkbox = QCheckBox(f"Apply to all {normalize_type(actuator.actuator_type)} actuators")
+        form_layout.addRow("", self.apply_to_type_checkbox)
+        layout.addLayout(form_layout)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
 class CreateBranchDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -1921,8 +1950,6 @@ class TimelineCanvas(FigureCanvas):
         self.axes = self.fig.add_axes([0.1, 0.15, 0.8, 0.8])  # Use add_axes to create a single plot
         self.axes.set_facecolor(color)
 
-        self.segmentation_api = signal_segmentation_api()
-        
         # Set spine color and customize appearance
         spine_color = to_rgba((240/255, 235/255, 229/255))
         self.axes.spines['bottom'].set_color(spine_color)
@@ -1980,15 +2007,22 @@ class TimelineCanvas(FigureCanvas):
         msg_box.setStyleSheet("background-color: rgb(193, 205, 215);")
         msg_box.setWindowTitle("Time Range Overlap")
         msg_box.setText(f"The time range overlaps with an existing signal.")
-        msg_box.setInformativeText("Would you like to replace the overlapping region or reset the time range of the new signal?")
+        msg_box.setInformativeText("Would you like to replace the overlapping region, layer the new signal on top of it, or reset the time range of the new signal?")
 
         replace_button = msg_box.addButton("Replace", QMessageBox.ButtonRole.YesRole)
+        layer_button = msg_box.addButton("Layer", QMessageBox.ButtonRole.AcceptRole)
         reset_button = msg_box.addButton("Reset", QMessageBox.ButtonRole.NoRole)
 
         msg_box.exec()
 
         if msg_box.clickedButton() == replace_button:
             self.replace_overlap(new_start_time, new_stop_time, signal_data, signal_type, parameters)
+        elif msg_box.clickedButton() == layer_button:
+            # Keep the existing clips untouched and stack the new one above them
+            blend, ok = QInputDialog.getItem(self, "Blend Mode", "Mix the new signal with the signals below it using:", list(BLEND_MODES), 0, False)
+            if ok:
+                self.record_signal(signal_type, signal_data, new_start_time, new_stop_time, parameters,
+                                   layer=self.next_layer(new_start_time, new_stop_time), blend=blend)
         else:
             # Adjust the previous signal to keep non-overlapping parts
             self.adjust_previous_signals(new_start_time, new_stop_time)
@@ -1997,11 +2031,42 @@ class TimelineCanvas(FigureCanvas):
             start_time, stop_time = self.show_time_input_dialog(signal_type)
             if start_time is not None and stop_time is not None and stop_time > start_time:
                 if self.check_overlap(start_time, stop_time):
-                    self.handle_overlap(start_time, stop_time, signal_type, signal_data)
+                    self.handle_overlap(start_time, stop_time, signal_type, signal_data, parameters)
                 else:
-                    self.record_signal(signal_type, signal_data, start_time, stop_time, None)
+                    self.record_signal(signal_type, signal_data, start_time, stop_time, parameters)
+
+    def next_layer(self, new_start_time, new_stop_time):
+        """Layer index just above every clip overlapping the given time range."""
+        overlapping_layers = [
+            signal.get("layer", 0) for signal in self.signals
+            if not (new_stop_time <= signal["start_time"] or new_start_time >= signal["stop_time"])
+        ]
+        return max(overlapping_layers, default=-1) + 1
 
 
+    def clip_part(self, signal, start_time, stop_time):
+        """
+        Copy of a clip restricted to [start_time, stop_time] (inside the clip), its samples sliced at
+        the timeline resolution and its tracks at their own rate. Layer, blend and a pending
+        segmentation are kept.
+        """
+        start_offset = start_time - signal["start_time"]
+        stop_offset = None if stop_time >= signal["stop_time"] else stop_time - signal["start_time"]
+        first = int(start_offset * TIME_STAMP)
+        last = None if stop_offset is None else int(stop_offset * TIME_STAMP)
+        rate = track_rate(signal)
+        part = dict(signal)
+        part.update({
+            "data": signal["data"][first:last],
+            "high_freq": slice_track(signal["high_freq"], rate, start_offset, stop_offset),
+            "low_freq": slice_track(signal["low_freq"], rate, start_offset, stop_offset),
+            **{name: slice_track(signal[name], rate, start_offset, stop_offset)
+               for name in QUANTIZED_TRACKS if signal.get(name) is not None},
+            "start_time": start_time,
+            "stop_time": stop_time,
+        })
+        return part
+
     def replace_overlap(self, new_start_time, new_stop_time, new_signal_data, new_signal_type, new_signal_parameters):
         adjusted_signals = []
 
@@ -2010,30 +2075,16 @@ class TimelineCanvas(FigureCanvas):
                 # Case: The new signal overlaps the end of this signal
                 if new_stop_time < signal["stop_time"]:
                     # Trim the end of the original signal and keep the non-overlapping part
-                    signal_part = {
-                        "type": signal["type"],
-                        "data": signal["data"][:int((new_start_time - signal["start_time"]) * TIME_STAMP)],
-                        "high_freq": signal["high_freq"][:int((new_start_time - signal["start_time"]) * TIME_STAMP)],
-                        "low_freq": signal["low_freq"][:int((new_start_time - signal["start_time"]) * TIME_STAMP)],
-                        "start_time": signal["start_time"],
-                        "stop_time": new_start_time,
-                        "parameters": signal["parameters"]
-                    }
+                    signal_part = self.clip_part(signal, signal["start_time"], new_start_time)
                     adjusted_signals.append(signal_part)
                 else:
                     # Remove the overlapping portion of the original signal
-                    signal["stop_time"] = new_start_time
-                    signal["data"] = signal["data"][:int((new_start_time - signal["start_time"]) * TIME_STAMP)]
-                    signal["high_freq"] = signal["high_freq"][:int((new_start_time - signal["start_time"]) * TIME_STAMP)]
-                    signal["low_freq"] = signal["low_freq"][:int((new_start_time - signal["start_time"]) * TIME_STAMP)]
+                    signal.update(self.clip_part(signal, signal["start_time"], new_start_time))
                     adjusted_signals.append(signal)
 
             elif signal["start_time"] < new_stop_time < signal["stop_time"]:
                 # Case: The new signal overlaps the start of this signal
-                signal["start_time"] = new_stop_time
-                signal["data"] = signal["data"][int((new_stop_time - signal["start_time"]) * TIME_STAMP):]
-                signal["high_freq"] = signal["high_freq"][int((new_stop_time - signal["start_time"]) * TIME_STAMP):]
-                signal["low_freq"] = signal["low_freq"][int((new_stop_time - signal["start_time"]) * TIME_STAMP):]
+                signal.update(self.clip_part(signal, new_stop_time, signal["stop_time"]))
                 adjusted_signals.append(signal)
 
             elif new_start_time <= signal["start_time"] and new_stop_time >= signal["stop_time"]:
@@ -2045,15 +2096,22 @@ class TimelineCanvas(FigureCanvas):
                 adjusted_signals.append(signal)
 
         # Add the new signal as well
-        adjusted_signals.append({
+        new_clip = {
             "type": new_signal_type,
             "data": new_signal_data["data"],
             "high_freq": new_signal_data["high_freq"],
             "low_freq": new_signal_data["low_freq"],
+            "track_rate": new_signal_data.get("track_rate", TRACK_RATE),
+            "duty": new_signal_data.get("duty"),
+            "freq_index": new_signal_data.get("freq_index"),
             "start_time": new_start_time,
             "stop_time": new_stop_time,
             "parameters": new_signal_parameters
-        })
+        }
+        for name in ("pending", "pending_start"):
+            if name in new_signal_data:
+                new_clip[name] = new_signal_data[name]
+        adjusted_signals.append(new_clip)
 
         self.signals = adjusted_signals
         self.plot_all_signals()  # Update the plot with the modified signals
@@ -2066,50 +2124,20 @@ class TimelineCanvas(FigureCanvas):
                 # Case: The new signal overlaps the end of this signal
                 if new_stop_time < signal["stop_time"]:
                     # Trim the end of the original signal and keep the non-overlapping part
-                    signal_part = {
-                        "type": signal["type"],
-                        "data": signal["data"][:int((new_start_time - signal["start_time"]) * TIME_STAMP)],
-                        "high_freq": signal["high_freq"][:int((new_start_time - signal["start_time"]) * TIME_STAMP)],
-                        "low_freq": signal["low_freq"][:int((new_start_time - signal["start_time"]) * TIME_STAMP)],
-                        "start_time": signal["start_time"],
-                        "stop_time": new_start_time,
-                        "parameters": signal["parameters"]
-                    }
+                    signal_part = self.clip_part(signal, signal["start_time"], new_start_time)
                     adjusted_signals.append(signal_part)
                 else:
                     # Remove the overlapping portion of the original signal
-                    signal["stop_time"] = new_start_time
-                    signal["data"] = signal["data"][:int((new_start_time - signal["start_time"]) * TIME_STAMP)]
-                    signal["high_freq"] = signal["high_freq"][:int((new_start_time - signal["start_time"]) * TIME_STAMP)]
-                    signal["low_freq"] = signal["low_freq"][:int((new_start_time - signal["start_time"]) * TIME_STAMP)]
+                    signal.update(self.clip_part(signal, signal["start_time"], new_start_time))
                     adjusted_signals.append(signal)
             elif signal["start_time"] < new_stop_time < signal["stop_time"]:
                 # Case: The new signal overlaps the start of this signal
-                signal["start_time"] = new_stop_time
-                signal["data"] = signal["data"][int((new_stop_time - signal["start_time"]) * TIME_STAMP):]
-                signal["high_freq"] = signal["high_freq"][int((new_stop_time - signal["start_time"]) * TIME_STAMP):]
-                signal["low_freq"] = signal["low_freq"][int((new_stop_time - signal["start_time"]) * TIME_STAMP):]
+                signal.update(self.clip_part(signal, new_stop_time, signal["stop_time"]))
                 adjusted_signals.append(signal)
             elif signal["start_time"] < new_start_time and signal["stop_time"] > new_stop_time:
                 # Case: The new signal completely overlaps this signal
-                signal_part1 = {
-                    "type": signal["type"],
-                    "data": signal["data"][:int((new_start_time - signal["start_time"]) * TIME_STAMP)],
-                    "high_freq": signal["high_freq"][:int((new_start_time - signal["start_time"]) * TIME_STAMP)],
-                    "low_freq": signal["low_freq"][:int((new_start_time - signal["start_time"]) * TIME_STAMP)],
-                    "start_time": signal["start_time"],
-                    "stop_time": new_start_time,
-                    "parameters": signal["parameters"]
-                }
-                signal_part2 = {
-                    "type": signal["type"],
-                    "data": signal["data"][int((new_stop_time - signal["start_time"]) * TIME_STAMP):],
-                    "high_freq": signal["high_freq"][int((new_stop_time - signal["start_time"]) * TIME_STAMP):],
-                    "low_freq": signal["low_freq"][int((new_stop_time - signal["start_time"]) * TIME_STAMP):],
-                    "start_time": new_stop_time,
-                    "stop_time": signal["stop_time"],
-                    "parameters": signal["parameters"]
-                }
+                signal_part1 = self.clip_part(signal, signal["start_time"], new_start_time)
+                signal_part2 = self.clip_part(signal, new_stop_time, signal["stop_time"])
                 adjusted_signals.extend([signal_part1, signal_part2])
             else:
                 # No overlap, keep the signal as is
@@ -2136,20 +2164,12 @@ class TimelineCanvas(FigureCanvas):
         # Determine if the signal is customized or imported
         if signal_type in self.app_reference.custom_signals or signal_type in self.app_reference.imported_signals:
             signal_data = self.get_signal_data(signal_type)
-            if signal_data:
+            if signal_data is not None and len(signal_data):
                 start_time, stop_time = self.show_time_input_dialog(signal_type)
                 if start_time is not None and stop_time is not None and stop_time > start_time:
-                    # Perform segmentation to get high and low frequency components
-                    high_freq_signal, low_freq_signal = self.segmentation_api.signal_segmentation(
-                        product_signal=signal_data, sampling_rate=TIME_STAMP, downsample_rate=200
-                    )
-
-                    # Keep the original structure with "data" and add the new frequency components
-                    signal_data = {
-                        'data': signal_data,  # Original data is stored under "data" (unchanged)
-                        'high_freq': high_freq_signal.tolist(),  # High frequency data
-                        'low_freq': low_freq_signal.tolist()     # Low frequency data
-                    }
+                    # Segmentation runs in the background, the clip gets placeholder tracks until it is done
+                    stored = self.app_reference.imported_signals.get(signal_type, {}).get("segmentation")
+                    signal_data = self.app_reference.request_segmentation(signal_data, start_time, stored)
 
                     # Print the lengths of data, high_freq, and low_freq
                     print(f"Original Data Length: {len(signal_data['data'])}, First 10 elements: {signal_data['data'][:10]}")
@@ -2171,17 +2191,8 @@ class TimelineCanvas(FigureCanvas):
                 if start_time is not None and stop_time is not None and stop_time > start_time:
                     signal_data = self.generate_signal_data(signal_type, parameters)
 
-                    # Perform segmentation to get high and low frequency components
-                    high_freq_signal, low_freq_signal = self.segmentation_api.signal_segmentation(
-                        product_signal=signal_data, sampling_rate=TIME_STAMP, downsample_rate=200
-                    )
-
-                    # Keep the original structure with "data" and add the new frequency components
-                    signal_data = {
-                        'data': signal_data,  # Original data is stored under "data" (unchanged)
-                        'high_freq': high_freq_signal.tolist(),  # High frequency data
-                        'low_freq': low_freq_signal.tolist()     # Low frequency data
-                    }
+                    # Segmentation runs in the background, the clip gets placeholder tracks until it is done
+                    signal_data = self.app_reference.request_segmentation(signal_data, start_time)
 
                     # Print the lengths of data, high_freq, and low_freq
                     print(f"Original Data Length: {len(signal_data['data'])}, First 10 elements: {signal_data['data'][:10]}")
@@ -2200,6 +2211,7 @@ class TimelineCanvas(FigureCanvas):
             self.plot_all_signals()
 
         self.app_reference.actuator_signals[self.app_reference.current_actuator] = self.signals
+        self.app_reference.clips_changed(self.app_reference.current_actuator)
         self.app_reference.update_actuator_text()
         self.app_reference.update_pushButton_5_state()
 
@@ -2242,19 +2254,28 @@ class TimelineCanvas(FigureCanvas):
         return None  # Return None if dialog was canceled or invalid
 
 
-    def record_signal(self, signal_type, signal_data, start_time, stop_time, parameters):
+    def record_signal(self, signal_type, signal_data, start_time, stop_time, parameters, layer=0, blend="max"):
         """Record the signal to the timelinecanvas. In there the signal_data is unpacked to "data", "high_freq", and "low_freq" """
         # Record the signal data, including original, high frequency, and low frequency components
         print("Recorded")
-        self.signals.append({
+        clip = {
             "type": signal_type,
             "data": signal_data['data'],          # Store the original data as "data"
             "high_freq": signal_data['high_freq'],  # Store high frequency data
             "low_freq": signal_data['low_freq'],    # Store low frequency data
+            "track_rate": signal_data.get('track_rate', TRACK_RATE),  # Values per second of the tracks
+            "duty": signal_data.get('duty'),  # Tracks quantized for the motors (uint8)
+            "freq_index": signal_data.get('freq_index'),
             "start_time": start_time,
             "stop_time": stop_time,
-            "parameters": parameters
-        })
+            "parameters": parameters,
+            "layer": layer,  # Clips on higher layers are mixed over the lower ones
+            "blend": blend   # max, sum (clamped) or multiply
+        }
+        if "pending" in signal_data:
+            clip["pending"] = signal_data["pending"]  # Id of the segmentation task filling in the tracks
+            clip["pending_start"] = signal_data["pending_start"]  # Where the whole signal was dropped
+        self.signals.append(clip)
 
     def plot_all_signals(self):
         # Set a variable to control which signal component to plot
@@ -2274,9 +2295,10 @@ class TimelineCanvas(FigureCanvas):
         # Store the signal duration for use in dragging functionality
         self.signal_duration = max_stop_time
 
-        # Initialize an empty array of zeros for the full duration
+        # Initialize an empty array of zeros for the full duration (drawn in the selected precision)
         total_samples = int(max_stop_time * TIME_STAMP)
-        combined_signal = np.zeros(total_samples)
+        dtype = sample_dtype(self.app_reference.signal_precision)
+        combined_signal = np.zeros(total_samples, dtype=dtype)
 
         # Fill in the combined signal with each recorded signal's selected data component
         for signal in self.signals:
@@ -2286,8 +2308,12 @@ class TimelineCanvas(FigureCanvas):
 
             # Use only the selected component (data, high_freq, low_freq)
             if component_to_plot in signal and len(signal[component_to_plot]) > 0:
+                component = signal[component_to_plot]
+                if component_to_plot != 'data':
+                    # The tracks are stored at their own rate, upsample them to the drawn samples
+                    component = display_track(component, track_rate(signal), signal_duration)
                 # Adjust the signal data to fit the required duration (stretch or truncate as needed)
-                signal_data = np.tile(signal[component_to_plot], int(np.ceil(signal_duration / len(signal[component_to_plot]))))[:signal_duration]
+                signal_data = np.tile(component, int(np.ceil(signal_duration / len(component))))[:signal_duration]
 
                 # If the adjusted signal_data is still too short, pad it with zeros
                 if len(signal_data) < signal_duration:
@@ -2300,7 +2326,7 @@ class TimelineCanvas(FigureCanvas):
             combined_signal[start_sample:stop_sample] = signal_data
 
         # Generate time array for the x-axis
-        t = np.linspace(0, max_stop_time, total_samples)
+        t = np.linspace(0, max_stop_time, total_samples, dtype=dtype)
         self.plot_signal_data(t, combined_signal)
 
 
@@ -2345,16 +2371,21 @@ class TimelineCanvas(FigureCanvas):
 
 
     def generate_signal_data(self, signal_type, parameters):
-        # Generate the signal data based on the type and modified parameters
+        """Samples of a parameterized signal, stored in the selected precision (see signal_precision)."""
+        return to_storage(self.generate_samples(signal_type, parameters), self.app_reference.signal_precision)
+
+    def generate_samples(self, signal_type, parameters):
+        # Generate the signal data based on the type and modified parameters, as a float64 array
+        # (generate_signal_data converts it once to the stored form)
         t = np.linspace(0, parameters["duration"], int(TIME_STAMP * parameters["duration"]))
         if signal_type == "Sine":
-            return np.sin(2 * np.pi * parameters["frequency"] * t).tolist()
+            return np.sin(2 * np.pi * parameters["frequency"] * t)
         elif signal_type == "Square":
-            return np.sign(np.sin(2 * np.pi * parameters["frequency"] * t)).tolist()
+            return np.sign(np.sin(2 * np.pi * parameters["frequency"] * t))
         elif signal_type == "Saw":
-            return (2 * (t * parameters["frequency"] - np.floor(t * parameters["frequency"] + 0.5))).tolist()
+            return 2 * (t * parameters["frequency"] - np.floor(t * parameters["frequency"] + 0.5))
         elif signal_type == "Triangle":
-            return (2 * np.abs(2 * (t * parameters["frequency"] - np.floor(t * parameters["frequency"] + 0.5))) - 1).tolist()
+            return 2 * np.abs(2 * (t * parameters["frequency"] - np.floor(t * parameters["frequency"] + 0.5))) - 1
         elif signal_type == "Chirp":
             instantaneous_frequency = parameters["frequency"] + parameters["rate"] * t
             if parameters["chirp_type"] == 'Sine':
@@ -2370,7 +2401,7 @@ class TimelineCanvas(FigureCanvas):
                 # Generate the triangle waveform with time-varying frequency
                 return signal.sawtooth(2 * np.pi * np.cumsum(instantaneous_frequency) / TIME_STAMP, 0.5)
             else:
-                return np.zeros_like(t).tolist()  # Default for unsupported types
+                return np.zeros_like(t)  # Default for unsupported types
         elif signal_type == "PWM":
             period = 1 / parameters["frequency"]
             return ((t % period) < (parameters["duty_cycle"] / 100) * period).astype(float)
@@ -2392,11 +2423,11 @@ class TimelineCanvas(FigureCanvas):
                 # Generate the triangle FM signal
                 return signal.sawtooth(instantaneous_phase, 0.5)
             else:
-                return np.zeros_like(t).tolist()  # Default for unsupported types
+                return np.zeros_like(t)  # Default for unsupported types
         elif signal_type == "Noise":
-            return (parameters["gain"] * np.random.normal(0, 1, len(t))).tolist()
+            return parameters["gain"] * np.random.normal(0, 1, len(t))
         else: 
-            return np.zeros_like(t).tolist()
+            return np.zeros_like(t)
 
     def get_signal_data(self, signal_type):
         # Retrieve signal data based on signal_type
@@ -2459,7 +2490,82 @@ class CanvasSizeDialog(QDialog):
         button = QPushButton("OK")
         button.clicked.connect(self.accept)
         self.layout.addWidget(button)
-        
+
+class LatencyCompensationDialog(QDialog):
+    def __init__(self, auto, lookahead_ms, measured_ms, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Latency Compensation")
+        layout = QVBoxLayout(self)
+
+        form_layout = QFormLayout()
+        self.auto_checkbox = QCheckBox("Follow measured latency")
+        self.auto_checkbox.setChecked(auto)
+        form_layout.addRow("Auto:", self.auto_checkbox)
+
+        self.lookahead_input = QDoubleSpinBox()
+        self.lookahead_input.setRange(0, 250)  # Same bound as PlaybackWorker.MAX_LOOKAHEAD
+        self.lookahead_input.setDecimals(1)
+        self.lookahead_input.setValue(lookahead_ms)
+        self.lookahead_input.setEnabled(not auto)
+        form_layout.addRow("Lookahead (ms):", self.lookahead_input)
+        form_layout.addRow("Measured latency:", QLabel(f"{measured_ms:.1f} ms"))
+        self.auto_checkbox.toggled.connect(lambda checked: self.lookahead_input.setEnabled(not checked))
+
+        layout.addLayout(form_layout)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        button_box.accepted.connect(self.accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+class LoopRegionDialog(QDialog):
+    def __init__(self, region, total_time, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Loop Region")
+        layout = QVBoxLayout(self)
+        start, stop = region
+
+        form_layout = QFormLayout()
+        self.whole_design_checkbox = QCheckBox("Loop the whole design")
+        self.whole_design_checkbox.setChecked(start == 0 and stop is None)
+        form_layout.addRow("Whole design:", self.whole_design_checkbox)
+
+        self.start_input = QDoubleSpinBox()
+        self.start_input.setRange(0, max(total_time, 0.001))
+        self.start_input.setDecimals(3)
+        self.start_input.setValue(start)
+        form_layout.addRow("Start (s):", self.start_input)
+
+        self.stop_input = QDoubleSpinBox()
+        self.stop_input.setRange(0, max(total_time, 0.001))
+        self.stop_input.setDecimals(3)
+        self.stop_input.setValue(total_time if stop is None else stop)
+        form_layout.addRow("Stop (s):", self.stop_input)
+
+        def update_enabled(checked):
+            self.start_input.setEnabled(not checked)
+            self.stop_input.setEnabled(not checked)
+        update_enabled(self.whole_design_checkbox.isChecked())
+        self.whole_design_checkbox.toggled.connect(update_enabled)
+
+        layout.addLayout(form_layout)
+
+        button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        button_box.accepted.connect(self.validate_and_accept)
+        button_box.rejected.connect(self.reject)
+        layout.addWidget(button_box)
+
+    def validate_and_accept(self):
+        if not self.whole_design_checkbox.isChecked() and self.stop_input.value() <= self.start_input.value():
+            QMessageBox.warning(self, "Invalid Region", "The loop stop time must be after its start time.")
+            return
+        self.accept()
+
+    def get_region(self):
+        if self.whole_design_checkbox.isChecked():
+            return (0.0, None)
+        return (self.start_input.value(), self.stop_input.value())
+
 class FloatingVerticalSlider(QSlider):
     def __init__(self, parent=None, app_reference=None):
         super().__init__(Qt.Orientation.Vertical, parent)
@@ -2543,6 +2649,15 @@ class FloatingVerticalSlider(QSlider):
             self.slider_start_pos = event.globalPosition().toPoint()
             super().mousePressEvent(event)
 
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.MouseButton.LeftButton:
+            self.slider_start_pos = None  # The playhead follows playback again
+            self.app_reference.finish_scrub()
+        super().mouseReleaseEvent(event)
+
+    def is_dragged(self):
+        return self.slider_start_pos is not None
+
     def mouseMoveEvent(self, event):
         if not self.slider_movable:
             event.ignore()
@@ -2560,13 +2675,26 @@ class FloatingVerticalSlider(QSlider):
 
             self.move(int(new_x), self.y())  # Cast new_x to int before passing to move()
 
-            # Update the current time position based on the slider's new location
+            # Update the current time position based on the slider's new location (coalesced per frame)
             total_time = self.app_reference.calculate_total_time()
             if total_time > 0:
                 time_position = total_time * (new_x - self.left_offset) / (self.parent().width() - self.left_offset - self.right_offset)
-                self.app_reference.set_current_time_position_manually(time_position)
+                self.app_reference.request_scrub(time_position)
 
 class Haptics_App(QtWidgets.QMainWindow):
+    playback_requested = pyqtSignal(object, object, float)  # design snapshot, calibration luts, start time position
+    playback_stop_requested = pyqtSignal()
+    playback_seek_requested = pyqtSignal(float)  # new time position while playing
+    scrub_preview_requested = pyqtSignal(object, object, float)  # design snapshot, calibration luts, scrub position
+    control_rate_changed = pyqtSignal(int)  # Hz
+    loop_changed = pyqtSignal(object)  # None, or (start, stop) with stop None for the whole design
+    latency_compensation_changed = pyqtSignal(bool, float)  # auto, lookahead in seconds
+
+    MAX_GUI_FRAME_RATE = 60  # Hz, the playback view never refreshes faster than this or than the screen
+
+    SCRUB_FRAME_INTERVAL = 16  # ms, scrub positions are evaluated at most once per display frame
+    SCRUB_PREVIEW_INTERVAL = 0.1  # s, minimum time between two haptic previews of the scrub position
+
     def __init__(self):
         super().__init__()
         # Get the absolute path to the current script
@@ -2648,6 +2776,10 @@ class Haptics_App(QtWidgets.QMainWindow):
 
         # Connect the import waveform action to the import_waveform method
         self.ui.actionImport_Waveform.triggered.connect(self.import_waveform)
+        self.actionImport_Waveform_Folder = QAction("Import Waveform Folder...", self)
+        self.ui.menuMenu.insertAction(self.ui.actionImport_Waveform, self.actionImport_Waveform_Folder)
+        self.ui.menuMenu.insertAction(self.actionImport_Waveform_Folder, self.ui.actionImport_Waveform)
+        self.actionImport_Waveform_Folder.triggered.connect(self.import_waveform_folder)
 
         # Connect the actuator_added signal to the add_actuator_to_timeline slot
         self.actuator_canvas.actuator_added.connect(self.add_actuator_to_timeline)
@@ -2692,10 +2824,29 @@ class Haptics_App(QtWidgets.QMainWindow):
 
         # Add a dictionary to store signals for each actuator
         self.actuator_signals = {}
+        self.clip_index = ClipIndex()  # Active clip lookup, see clips_changed
+        self.segmentation_cache = SegmentationCache()  # Tracks of already segmented signals, shared between drops
+        # task id (unique across sessions, clips carry it as "pending") -> (task, cache key or batch settings,
+        # None or batch signals, progress percent)
+        self.segmentation_tasks = {}
+        self.running_segmentations = {}  # cache key -> id of the task segmenting it, shared by repeated drops
+        self.segmentation_progress = QProgressBar()
+        self.segmentation_progress.setMaximumWidth(160)
+        self.segmentation_progress.setFormat("Analyzing %p%")
+        self.segmentation_cancel_button = QPushButton("Cancel")
+        self.segmentation_cancel_button.clicked.connect(self.cancel_segmentation)
+        self.statusBar().addPermanentWidget(self.segmentation_progress)
+        self.statusBar().addPermanentWidget(self.segmentation_cancel_button)
+        self.segmentation_progress.hide()
+        self.segmentation_cancel_button.hide()
+        self.design_duration = None  # Cached latest stop time of all clips, None when it must be recomputed
 
         # Initialize timeline_canvases as an empty dictionary
         self.timeline_canvases = {}
 
+        # Calibration tables per actuator type and per actuator, saved with the design
+        self.actuator_calibration = {"types": {}, "actuators": {}}
+
         # Instantiate DesignSaver
         self.design_saver = DesignSaver(self.actuator_canvas, self.timeline_canvases, self.maincanvas, self)
 
@@ -2720,13 +2871,6 @@ class Haptics_App(QtWidgets.QMainWindow):
         # Connect the pushButton_5 click to the toggle_slider_movement method
         self.pushButton_5.clicked.connect(self.toggle_slider_movement)
 
-        # setup the timeline timer
-        self.timeline_thread = QThread()
-        self.timeline_timer = TimelineTimer()
-        self.timeline_timer.time_updated.connect(self.move_slider)
-        self.timeline_timer.moveToThread(self.timeline_thread)
-        self.timeline_thread.start()
-        
 
         # Initialize the current time position
         self.current_time_position = 0  
@@ -2740,11 +2884,90 @@ class Haptics_App(QtWidgets.QMainWindow):
         # Call this method initially to set the state of pushButton_5
         self.update_pushButton_5_state()
 
-        self.current_amplitudes = {}
-
         self.ble_api = python_ble_api()
         self.haptic_manager = HapticCommandManager(self.ble_api)
 
+        # Setup the playback worker: scheduling and BLE writes run on their own thread,
+        # the GUI only receives the playhead position and the running actuators
+        self.playback_thread = QThread()
+        self.playback_worker = PlaybackWorker(self.haptic_manager)
+        self.playback_track_cache = {}  # Frozen envelope tracks reused between snapshots
+        self.playback_worker.moveToThread(self.playback_thread)
+        self.playback_requested.connect(self.playback_worker.play)
+        self.playback_stop_requested.connect(self.playback_worker.stop)
+        self.playback_seek_requested.connect(self.playback_worker.seek)
+        self.scrub_preview_requested.connect(self.playback_worker.preview)
+        self.control_rate_changed.connect(self.playback_worker.set_control_rate)
+        self.loop_changed.connect(self.playback_worker.set_loop)
+        self.playback_worker.playback_finished.connect(self.on_playback_finished)
+        self.playback_worker.latency_updated.connect(self.update_latency_label)
+        self.latency_compensation_changed.connect(self.playback_worker.set_latency_compensation)
+        # The worker's timers belong to the playback thread: delete it there when the thread stops
+        self.playback_thread.finished.connect(self.playback_worker.deleteLater)
+        self.playback_thread.start()
+
+        # Latency compensation settings, mirrored from the worker for the dialog
+        self.auto_lookahead = True
+        self.manual_lookahead = 0.0
+        self.measured_latency = 0.0
+        self.actionLatency_Compensation = self.ui.menuDevice.addAction("Latency Compensation...")
+        self.actionLatency_Compensation.triggered.connect(self.show_latency_compensation_dialog)
+
+        # Haptic clock: the worker samples the clips at control_rate, independently of the GUI frame clock
+        self.control_rate = DEFAULT_CONTROL_RATE
+        self.actionControl_Rate = self.ui.menuDevice.addAction("Haptic Control Rate...")
+        self.actionControl_Rate.triggered.connect(self.show_control_rate_dialog)
+
+        # Loop playback, wrapped inside the playback engine
+        self.loop_region = (0.0, None)  # Whole design
+        self.actionLoop_Playback = self.ui.menuDevice.addAction("Loop Playback")
+        self.actionLoop_Playback.setCheckable(True)
+        self.actionLoop_Playback.toggled.connect(self.emit_loop_setting)
+        self.actionLoop_Region = self.ui.menuDevice.addAction("Loop Region...")
+        self.actionLoop_Region.triggered.connect(self.show_loop_region_dialog)
+
+        # Segmentation settings used when a signal is dropped on a timeline
+        self.segmentation_mode = MODE_STFT
+        self.menuSegmentation = self.ui.menubar.addMenu("Segmentation")
+        self.actionGoertzel_Tracking = self.menuSegmentation.addAction("Fast Frequency Tracking (Goertzel)")
+        self.actionGoertzel_Tracking.setCheckable(True)
+        self.actionGoertzel_Tracking.toggled.connect(
+            lambda checked: setattr(self, 'segmentation_mode', MODE_GOERTZEL if checked else MODE_STFT)
+        )
+        self.segmentation_multirate = False
+        self.actionMultirate_Segmentation = self.menuSegmentation.addAction("Multi-rate Pipeline (decimate to 1 kHz)")
+        self.actionMultirate_Segmentation.setCheckable(True)
+        self.actionMultirate_Segmentation.toggled.connect(
+            lambda checked: setattr(self, 'segmentation_multirate', checked)
+        )
+        self.signal_precision = PRECISION_DOUBLE
+        self.actionSingle_Precision = self.menuSegmentation.addAction("Single Precision Signals (float32)")
+        self.actionSingle_Precision.setCheckable(True)
+        self.actionSingle_Precision.toggled.connect(
+            lambda checked: setattr(self, 'signal_precision', PRECISION_SINGLE if checked else PRECISION_DOUBLE)
+        )
+        self.fft_workers = DEFAULT_FFT_WORKERS  # Threads of the segmentation FFTs, -1 for every core
+        self.actionFFT_Workers = self.menuSegmentation.addAction("FFT Threads...")
+        self.actionFFT_Workers.triggered.connect(self.show_fft_workers_dialog)
+        self.menuSegmentation.addSeparator()
+        self.actionSegment_Imported = self.menuSegmentation.addAction("Segment Imported Signals")
+        self.actionSegment_Imported.triggered.connect(lambda: self.segment_imported_signals())
+
+        # GUI clock: redraws the playhead and highlights from the worker's latest PlaybackState
+        self.gui_frame_timer = QTimer(self)
+        self.gui_frame_timer.timeout.connect(self.refresh_playback_view)
+
+        # Scrubbing: slider drags are coalesced to one evaluation per frame, optionally felt on the actuators
+        self.pending_scrub_time = None
+        self.last_scrub_preview = 0.0
+        self.scrub_preview_active = False
+        self.scrub_timer = QTimer(self)
+        self.scrub_timer.setSingleShot(True)
+        self.scrub_timer.setInterval(self.SCRUB_FRAME_INTERVAL)
+        self.scrub_timer.timeout.connect(self.flush_scrub)
+        self.actionScrub_Preview = self.ui.menuDevice.addAction("Haptic Scrub Preview")
+        self.actionScrub_Preview.setCheckable(True)
+
         self.ui.actionConnect_Bluetooth_Device.triggered.connect(self.show_bluetooth_connect_dialog)
         self.ui.actionDisconnect_Bluetooth_Device.triggered.connect(self.show_bluetooth_disconnect_dialog)
 
@@ -2756,6 +2979,7 @@ class Haptics_App(QtWidgets.QMainWindow):
         self.ui.label_2.setStyleSheet("background-color: rgb(184, 199, 209);")
         self.ui.label_3.setStyleSheet("background-color: rgb(184, 199, 209);")
         self.ui.label_4.setStyleSheet("background-color: rgb(184, 199, 209);")
+        self.update_latency_label(0.0, 0.0)
         
     def open_drone_console(self):
         """Show the 3D drone grid dialog."""
@@ -2785,6 +3009,13 @@ class Haptics_App(QtWidgets.QMainWindow):
             except RuntimeError:
                 pass
             self._drone_console = None
+
+        # Drop the running segmentations and silence the actuators and shut down the playback thread
+        self.cancel_segmentation()
+        self.threadpool.waitForDone()
+        self.playback_stop_requested.emit()
+        self.playback_thread.quit()
+        self.playback_thread.wait()
         
         super().closeEvent(event)
 
@@ -2800,6 +3031,20 @@ class Haptics_App(QtWidgets.QMainWindow):
         self.label_2.setText(_translate("MainWindow", f"Current Time: {formatted_time}"))
 
 
+    def update_latency_label(self, latency, lookahead):
+        """Show the measured pipeline latency and the lookahead applied by the playback worker."""
+        self.measured_latency = latency
+        mode = "auto" if self.auto_lookahead else "manual"
+        self.ui.label_4.setText(f"Latency: {latency * 1000:.1f} ms (lookahead {lookahead * 1000:.1f} ms, {mode})")
+
+    def show_latency_compensation_dialog(self):
+        """Let the user pick automatic or fixed latency compensation."""
+        dialog = LatencyCompensationDialog(self.auto_lookahead, self.manual_lookahead * 1000, self.measured_latency * 1000, self)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            self.auto_lookahead = dialog.auto_checkbox.isChecked()
+            self.manual_lookahead = dialog.lookahead_input.value() / 1000
+            self.latency_compensation_changed.emit(self.auto_lookahead, self.manual_lookahead)
+
     def show_bluetooth_connect_dialog(self):
         """Show the Bluetooth connection dialog if no device is currently connected."""
         if not self.bluetooth_connected:
@@ -2881,35 +3126,110 @@ class Haptics_App(QtWidgets.QMainWindow):
         """Toggle slider movement and switch button icons."""
         if self.slider_moving:
             self.pause_slider_movement()
-            self.haptic_manager.stop_playback()
+            self.stop_haptic_playback()
         else:
             self.start_slider_movement()
-            self.haptic_manager.start_playback()
+            self.start_haptic_playback()
 
     def start_slider_movement(self):
         """Start moving the slider based on the current slider position."""
         self.start_time = time.time() - self.current_time_position  # Adjust start time based on current slider position
         self.slider_moving = True
-        self.timeline_timer.play()  # Timer interval for updating the slider position
         self.pushButton_5.setIcon(self.pause_icon)
         self.actuator_canvas.setEnabled(False)
+        screen = self.screen()
+        frame_rate = min(screen.refreshRate(), self.MAX_GUI_FRAME_RATE) if screen else self.MAX_GUI_FRAME_RATE
+        self.gui_frame_timer.start(int(1000 / max(1, frame_rate)))
 
     def pause_slider_movement(self):
         """Pause the slider movement."""
-        self.timeline_timer.pause()
+        if self.slider_moving:
+            self.refresh_playback_view()  # Keep the position playback had reached
+        self.gui_frame_timer.stop()
+        self.actuator_canvas.set_highlighted_actuators(frozenset())  # The worker silences every actuator
         self.slider_moving = False
         self.pushButton_5.setIcon(self.run_icon)  # Switch back to Run icon
         self.actuator_canvas.setEnabled(True)
 
+    def playback_inputs(self):
+        """Immutable snapshot of the design and the compiled calibration, as handed to the playback worker."""
+        actuator_types = {actuator.id: actuator.actuator_type for actuator in self.actuator_canvas.actuators}
+        calibration_luts = compile_calibration(self.actuator_calibration, actuator_types)
+        return snapshot_design(self.actuator_signals, self.playback_track_cache), calibration_luts
+
+    def start_haptic_playback(self):
+        """Hand an immutable snapshot of the design and the compiled calibration to the playback worker."""
+        snapshot, calibration_luts = self.playback_inputs()
+        self.playback_requested.emit(snapshot, calibration_luts, float(self.current_time_position))
+
+    def stop_haptic_playback(self):
+        """Ask the playback worker to stop and silence all running actuators."""
+        self.playback_stop_requested.emit()
+
+    def refresh_playback_view(self):
+        """GUI frame: draw the playhead and the running actuators from the worker's latest PlaybackState."""
+        state = self.playback_worker.state  # Immutable, read without locking
+        time_position = state.time_position
+        if state.playing:
+            time_position += time.perf_counter() - state.timestamp
+            if state.loop is not None and time_position >= state.loop[1]:
+                loop_start, loop_stop = state.loop
+                time_position = loop_start + (time_position - loop_start) % (loop_stop - loop_start)
+        self.move_slider(min(time_position, self.calculate_total_time()))
+        self.actuator_canvas.set_highlighted_actuators(state.active)
+
+    def show_control_rate_dialog(self):
+        control_rate, ok = QInputDialog.getInt(
+            self, "Haptic Control Rate", "Motor update rate (Hz):", self.control_rate, 10, MAX_CONTROL_RATE
+        )
+        if ok:
+            self.control_rate = control_rate
+            self.control_rate_changed.emit(control_rate)
+
+    def show_fft_workers_dialog(self):
+        cores = available_cores()
+        current = cores if self.fft_workers < 0 else self.fft_workers
+        fft_workers, ok = QInputDialog.getInt(
+            self, "FFT Threads", f"Threads used by the segmentation FFTs ({cores} cores available):", current, 1, cores
+        )
+        if ok:
+            self.fft_workers = -1 if fft_workers == cores else fft_workers
+
+    def emit_loop_setting(self):
+        self.loop_changed.emit(self.loop_region if self.actionLoop_Playback.isChecked() else None)
+
+    def show_loop_region_dialog(self):
+        dialog = LoopRegionDialog(self.loop_region, self.calculate_total_time(), self)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            self.loop_region = dialog.get_region()
+            if self.actionLoop_Playback.isChecked():
+                self.emit_loop_setting()  # Only the region changed, toggled won't fire
+            else:
+                self.actionLoop_Playback.setChecked(True)  # toggled sends the new region
+
+    def on_playback_finished(self):
+        """Reset the play button when the worker reached the end of the design."""
+        self.gui_frame_timer.stop()
+        self.actuator_canvas.set_highlighted_actuators(frozenset())
+        self.slider_moving = False
+        self.pushButton_5.setIcon(self.run_icon)
+        self.actuator_canvas.setEnabled(True)
+
+        # Reset to the beginning when reaching the end
+        self.current_time_position = 0  # Reset current position to 0 for next play
+
     # calculate the longest play time of all signals
     def calculate_total_time(self):
-        all_stop_times = []
-        for signals in self.actuator_signals.values():
-            all_stop_times.extend([signal["stop_time"] for signal in signals])
-        return max(all_stop_times) if all_stop_times else 0
+        if self.design_duration is None:
+            # Only recomputed after an edit, see clips_changed
+            self.design_duration = max(
+                (signal["stop_time"] for signals in self.actuator_signals.values() for signal in signals),
+                default=0,
+            )
+        return self.design_duration
 
     def move_slider(self, timeline_time):
-        """Move the slider in real time based on the signal's total time."""
+        """Move the slider to the playhead position published by the playback worker."""
         if self.slider_moving:
             self.current_time_position = timeline_time
             # Calculate the total time of all signals
@@ -2929,42 +3249,63 @@ class Haptics_App(QtWidgets.QMainWindow):
                 adjusted_width = self.ui.scrollAreaWidgetContents.width() - 2 * cm_to_pixels
                 new_pos = int(time_ratio * adjusted_width + cm_to_pixels)
 
-                # Move the slider to the new position
-                self.floating_slider.move(int(new_pos), self.floating_slider.y())
-
-                # Highlight actuators and update signals based on the new time position
-                current_amplitudes = self.update_current_amplitudes(self.current_time_position)
-                self.actuator_canvas.highlight_actuators_at_time(self.current_time_position)
+                # Move the slider to the new position, unless the user is dragging it
+                if not self.floating_slider.is_dragged():
+                    self.floating_slider.move(int(new_pos), self.floating_slider.y())
             else:
                 print("Warning: No signals found or invalid total time.")
-                self.timeline_timer.reset()
-                self.slider_moving = False
-                self.pushButton_5.setIcon(self.run_icon)
-                self.actuator_canvas.setEnabled(True)
-                return
+                self.pause_slider_movement()
+                self.stop_haptic_playback()
 
-            # Stop the slider when it reaches the end of the total time
-            if self.current_time_position >= total_time:
-                self.timeline_timer.reset()
-                self.slider_moving = False
-                self.pushButton_5.setIcon(self.run_icon)
-                self.actuator_canvas.setEnabled(True)
-                self.haptic_manager.stop_playback()
-
-                # Reset to the beginning when reaching the end
-                self.current_time_position = 0  # Reset current position to 0 for next play
+    def request_scrub(self, time_position):
+        """
+        Scrub to time_position. The first position is evaluated at once, the following ones only keep
+        the latest value until the next frame, so fast drags never queue up evaluations.
+        """
+        self.pending_scrub_time = time_position
+        if not self.scrub_timer.isActive():
+            self.flush_scrub()
 
-            # Update the haptic manager with the new signal information
-            # print(f"timeline time = {self.current_time_position}, time = {time.perf_counter()}")
-            self.haptic_manager.update(current_amplitudes)
+    def flush_scrub(self):
+        """Evaluate the latest scrub position, if any, and wait a frame before evaluating the next one."""
+        if self.pending_scrub_time is None:
+            return
+        time_position, self.pending_scrub_time = self.pending_scrub_time, None
+        self.set_current_time_position_manually(time_position)
+        self.preview_scrub(time_position)
+        self.scrub_timer.start()
+
+    def preview_scrub(self, time_position, force=False):
+        """Let the actuators play the scrub position (when enabled and stopped), at most every SCRUB_PREVIEW_INTERVAL."""
+        if self.slider_moving or not self.actionScrub_Preview.isChecked():
+            return
+        now = time.perf_counter()
+        if not force and now - self.last_scrub_preview < self.SCRUB_PREVIEW_INTERVAL:
+            return
+        self.last_scrub_preview = now
+        self.scrub_preview_active = True
+        snapshot, calibration_luts = self.playback_inputs()
+        self.scrub_preview_requested.emit(snapshot, calibration_luts, float(time_position))
+
+    def finish_scrub(self):
+        """Mouse released: evaluate the final position right away and silence the scrub preview."""
+        self.scrub_timer.stop()
+        self.flush_scrub()
+        self.scrub_timer.stop()
+        if self.scrub_preview_active:
+            self.scrub_preview_active = False
+            if not self.slider_moving:
+                self.stop_haptic_playback()
 
     def set_current_time_position_manually(self, time_position):
         """Set the current time position manually and update the slider position."""
         self.current_time_position = time_position
-        self.timeline_timer.manual_update(self.current_time_position)
         self.update_time_label(self.current_time_position)
-        self.update_current_amplitudes(self.current_time_position)
-        self.actuator_canvas.highlight_actuators_at_time(self.current_time_position)
+        if self.slider_moving:
+            # Keep playing from the new position, the worker sends only what differs from the motors' state
+            self.playback_seek_requested.emit(float(time_position))
+        else:
+            self.actuator_canvas.highlight_actuators_at_time(self.current_time_position)
 
 
     def setup_slider_layer(self):
@@ -3006,44 +3347,196 @@ class Haptics_App(QtWidgets.QMainWindow):
 
 
 
-    def update_current_amplitudes(self, time_position):
-        # Tracing the low frequency data
+    def segmentation_settings(self):
+        """What the tracks of a signal depend on, besides its samples."""
+        return {"mode": self.segmentation_mode, "multirate": self.segmentation_multirate, "track_rate": TRACK_RATE}
 
-        self.current_amplitudes.clear()
+    def segmentation_key(self, signal_data):
+        return self.segmentation_cache.key(signal_data, TIME_STAMP, TRACK_RATE, 102, self.segmentation_mode, self.segmentation_multirate)
 
+    def request_segmentation(self, signal_data, start_time, stored=None):
+        """
+        Clip tracks of a signal dropped at start_time: the tracks stored with the library signal (stored)
+        or cached when it was already segmented with the current settings, else silent placeholder
+        tracks marked "pending" while a SegmentationTask runs on the thread pool. Dropping a signal
+        that is already being segmented waits for the same task.
+        """
+        if stored is not None and stored["settings"] == self.segmentation_settings():
+            duty, freq_index = stored.get('duty'), stored.get('freq_index')
+            if duty is None:
+                duty, freq_index = quantize_tracks(stored['high_freq'], stored['low_freq'])
+            return {'data': signal_data, 'high_freq': stored['high_freq'], 'low_freq': stored['low_freq'],
+                    'duty': duty, 'freq_index': freq_index, 'track_rate': TRACK_RATE}
+        key = self.segmentation_key(signal_data)
+        tracks = self.segmentation_cache.get(key)
+        if tracks is not None:
+            high_freq_signal, low_freq_signal, duty, freq_index = tracks
+            return {'data': signal_data, 'high_freq': high_freq_signal, 'low_freq': low_freq_signal,
+                    'duty': duty, 'freq_index': freq_index, 'track_rate': TRACK_RATE}
+
+        task_id = self.running_segmentations.get(key)
+        if task_id is None:
+            task_id = uuid.uuid4().hex
+            task = SegmentationTask(task_id, signal_segmentation_api(self.fft_workers), signal_data, self.segmentation_mode, self.segmentation_multirate)
+            task.signals.progress.connect(self.segmentation_progressed)
+            task.signals.finished.connect(self.segmentation_finished)
+            task.signals.cancelled.connect(self.segmentation_cancelled)
+            task.signals.failed.connect(self.segmentation_failed)
+            self.segmentation_tasks[task_id] = (task, key, None, 0)
+            self.running_segmentations[key] = task_id
+            self.update_segmentation_progress()
+            self.threadpool.start(task)
+
+        # Silent until the analysis is done
+        placeholder = placeholder_track(track_length(len(signal_data)), storage_precision(signal_data))
+        silent = np.zeros(len(placeholder), dtype=np.uint8)
+        return {'data': signal_data, 'high_freq': placeholder, 'low_freq': placeholder, 'duty': silent, 'freq_index': silent,
+                'track_rate': TRACK_RATE, 'pending': task_id, 'pending_start': start_time}
+
+    def segment_imported_signals(self, names=None):
+        """
+        Segment the imported signals (all of them, or names) whose stored tracks are missing or were
+        computed with other settings, in parallel worker processes. The tracks are stored with each signal.
+        """
+        settings = self.segmentation_settings()
+        signals = {
+            name: self.imported_signals[name]["data"] for name in (names or list(self.imported_signals))
+            if name in self.imported_signals
+            and self.imported_signals[name].get("segmentation", {}).get("settings") != settings
+        }
+        if not signals:
+            self.statusBar().showMessage("Imported signals are already segmented.", 3000)
+            return
+        task_id = uuid.uuid4().hex
+        task = BatchSegmentationTask(task_id, signals, self.segmentation_mode, self.segmentation_multirate, fft_workers=self.fft_workers)
+        task.signals.progress.connect(self.segmentation_progressed)
+        task.signals.finished.connect(self.batch_segmentation_finished)
+        task.signals.cancelled.connect(self.segmentation_cancelled)
+        task.signals.failed.connect(self.segmentation_failed)
+        # The signal entries themselves, so renaming a signal meanwhile does not lose its tracks
+        targets = {name: self.imported_signals[name] for name in signals}
+        self.segmentation_tasks[task_id] = (task, settings, targets, 0)
+        self.update_segmentation_progress()
+        self.threadpool.start(task)
+
+    def batch_segmentation_finished(self, task_id, outcome):
+        """Store the tracks of a batch with their imported signals."""
+        if task_id not in self.segmentation_tasks:
+            return
+        _, settings, targets, _ = self.segmentation_tasks.pop(task_id)
+        results, errors = outcome
+        for name, (high_freq_signal, low_freq_signal, duty, freq_index) in results.items():
+            targets[name]["segmentation"] = {"settings": settings, "high_freq": high_freq_signal, "low_freq": low_freq_signal,
+                                             "duty": duty, "freq_index": freq_index}
+        self.update_segmentation_progress()
+        self.statusBar().showMessage(f"Segmented {len(results)} imported signal(s).", 3000)
+        if errors:
+            QMessageBox.warning(self, "Segmentation Failed", "Some signals could not be analyzed:\n" +
+                                "\n".join(f"{name}: {message}" for name, message in errors.items()))
+
+    def segmentation_progressed(self, task_id, percent):
+        if task_id in self.segmentation_tasks:
+            task, key, targets, _ = self.segmentation_tasks[task_id]
+            self.segmentation_tasks[task_id] = (task, key, targets, percent)
+            self.update_segmentation_progress()
+
+    def segmentation_finished(self, task_id, tracks):
+        """Put the computed tracks into every clip still waiting for them (also clips trimmed in the meantime)."""
+        if task_id not in self.segmentation_tasks:
+            return
+        _, key, _, _ = self.segmentation_tasks.pop(task_id)
+        self.forget_running_segmentation(task_id)
+        tracks = dict(zip(("high_freq", "low_freq") + QUANTIZED_TRACKS, self.segmentation_cache.put(key, tracks)))
         for actuator_id, signals in self.actuator_signals.items():
+            changed = False
             for signal in signals:
-                if signal["start_time"] <= time_position <= signal["stop_time"]:
-                    signal_duration = signal["stop_time"] - signal["start_time"]
-                    relative_position = (time_position - signal["start_time"]) / signal_duration
-                    index = int(relative_position * len(signal["low_freq"]))
-                    
-                    # Ensure index is within bounds
-                    index = max(0, min(index, len(signal["low_freq"]) - 1))
-                    
-                    amplitude = signal["low_freq"][index]
-                    frequency = signal["high_freq"][index]
-                    
-                    # Update current_amplitudes with only the amplitude and frequency
-                    self.current_amplitudes[actuator_id] = {
-                        "current_amplitude": amplitude,
-                        "current_frequency": frequency,
-                    }
+                if signal.get("pending") != task_id:
+                    continue
+                # Trims keep the samples aligned with the timeline, the part starts this far into the signal
+                first = max(0, int((signal["start_time"] - signal["pending_start"]) * TIME_STAMP))
+                last = first + len(signal["data"])
+                n_values = len(tracks["high_freq"])
+                if first == 0 and track_length(last) == n_values:
+                    signal.update(tracks)
+                else:
+                    start_offset = first / TIME_STAMP
+                    stop_offset = None if track_length(last) >= n_values else last / TIME_STAMP
+                    signal.update({name: slice_track(track, TRACK_RATE, start_offset, stop_offset) for name, track in tracks.items()})
+                signal["track_rate"] = TRACK_RATE
+                del signal["pending"], signal["pending_start"]
+                changed = True
+            if changed:
+                self.clips_changed(actuator_id)
+        self.update_segmentation_progress()
+        self.statusBar().showMessage("Signal analysis finished.", 3000)
+
+    def segmentation_cancelled(self, task_id):
+        """Remove the placeholder clips of a cancelled segmentation."""
+        self.segmentation_tasks.pop(task_id, None)
+        self.forget_running_segmentation(task_id)
+        self.remove_pending_clips(task_id)
+        self.update_segmentation_progress()
+        self.statusBar().showMessage("Signal analysis cancelled.", 3000)
+
+    def segmentation_failed(self, task_id, message):
+        self.segmentation_tasks.pop(task_id, None)
+        self.forget_running_segmentation(task_id)
+        self.remove_pending_clips(task_id)
+        self.update_segmentation_progress()
+        QMessageBox.warning(self, "Segmentation Failed", f"The signal could not be analyzed:\n{message}")
+
+    def cancel_segmentation(self, clips_only=False):
+        """
+        Cancel every running segmentation (clips_only: only the ones of timeline clips, not the imported
+        signal batches), their clips are removed once the tasks have stopped.
+        """
+        for task_id, (task, _, _, _) in self.segmentation_tasks.items():
+            if not clips_only or isinstance(task, SegmentationTask):
+                task.cancel()
+                self.forget_running_segmentation(task_id)  # Later drops start a new task
 
-                    break  # Only handle one signal per actuator at a time
+    def forget_running_segmentation(self, task_id):
+        for key in [key for key, running_id in self.running_segmentations.items() if running_id == task_id]:
+            del self.running_segmentations[key]
 
-        # Return both the current_amplitudes
-        return self.current_amplitudes
+    def request_missing_tracks(self):
+        """Segment again the clips of a loaded design that were saved while their analysis was running."""
+        for actuator_id, signals in self.actuator_signals.items():
+            for signal in signals:
+                if signal.get("low_freq") is None and signal.get("data") is not None and len(signal["data"]):
+                    tracks = self.request_segmentation(signal["data"], signal["start_time"])
+                    signal.update({name: value for name, value in tracks.items() if name != "data"})
+            self.clips_changed(actuator_id)
+
+    def remove_pending_clips(self, task_id):
+        for actuator_id, signals in self.actuator_signals.items():
+            remaining = [signal for signal in signals if signal.get("pending") != task_id]
+            if len(remaining) != len(signals):
+                signals[:] = remaining  # The timeline canvas shares this list
+                self.clips_changed(actuator_id)
+        if self.current_actuator in self.timeline_canvases:
+            self.timeline_canvases[self.current_actuator].plot_all_signals()
+        self.update_actuator_text()
+        self.update_pushButton_5_state()
+
+    def update_segmentation_progress(self):
+        """Show the mean progress of the running segmentations in the status bar."""
+        running = bool(self.segmentation_tasks)
+        if running:
+            percents = [percent for _, _, _, percent in self.segmentation_tasks.values()]
+            self.segmentation_progress.setValue(int(sum(percents) / len(percents)))
+        self.segmentation_progress.setVisible(running)
+        self.segmentation_cancel_button.setVisible(running)
+
+    def clips_changed(self, actuator_id=None):
+        """Call after editing the clips of an actuator (None: the whole design) so cached lookups are rebuilt."""
+        self.clip_index.invalidate(actuator_id)
+        self.design_duration = None
 
     def update_actuator_text(self):
         # Find the global largest stop time across all actuators
-        all_stop_times = []
-        for signals in self.actuator_signals.values():
-            all_stop_times.extend([signal["stop_time"] for signal in signals])
-
-        if all_stop_times:
-            global_total_time = max(all_stop_times)
-        else:
+        global_total_time = self.calculate_total_time()
+        if not global_total_time:
             global_total_time = 1  # Avoid division by zero in the width calculation
 
         # Define the 3 cm left offset and 1 cm right offset in pixels
@@ -3094,8 +3587,13 @@ class Haptics_App(QtWidgets.QMainWindow):
                 signals.sort(key=lambda signal: signal["start_time"])
 
                 for signal in signals:
+                    # Layered clips only show the part that is not already covered by the strip
+                    if signal["stop_time"] <= last_stop_time:
+                        continue
+                    visible_start_time = max(signal["start_time"], last_stop_time)
+
                     # Calculate the relative width of the signal widget based on its duration
-                    signal_duration = signal["stop_time"] - signal["start_time"]
+                    signal_duration = signal["stop_time"] - visible_start_time
                     signal_width_ratio = signal_duration / global_total_time
                     signal_width = int(signal_width_ratio * widget_width)
 
@@ -3114,7 +3612,8 @@ class Haptics_App(QtWidgets.QMainWindow):
                         timeline_layout.addItem(spacer)
 
                     # Create the signal widget, making it smaller vertically and with rounded corners
-                    signal_widget = QtWidgets.QLabel(f'{signal["type"]} ({", ".join([f"{k}: {v}" for k, v in (signal["parameters"] or {}).items()])})')
+                    layer_tag = f'[{signal.get("blend", "max")}] ' if signal.get("layer", 0) > 0 else ''
+                    signal_widget = QtWidgets.QLabel(f'{layer_tag}{signal["type"]} ({", ".join([f"{k}: {v}" for k, v in (signal["parameters"] or {}).items()])})')
                     signal_widget.setFixedSize(signal_width, 30)  # Set smaller height for the signal widget
                     signal_widget.setStyleSheet("""
                         background-color: rgba(100, 150, 250, 150); 
@@ -3250,6 +3749,7 @@ class Haptics_App(QtWidgets.QMainWindow):
                 self.actuator_canvas.clear_canvas()  # Clear actuators
                 self.clear_timeline_canvas()  # Clear timeline
                 self.reset_color_management()
+                self.actuator_calibration["actuators"].clear()  # Per-actuator tables belong to the cleared actuators
                 self.switch_to_main_canvas()
                 self.update_pushButton_5_state()
                 
@@ -3262,6 +3762,7 @@ class Haptics_App(QtWidgets.QMainWindow):
             self.actuator_canvas.clear_canvas()  # Clear actuators
             self.clear_timeline_canvas()  # Clear timeline
             self.reset_color_management()
+            self.actuator_calibration["actuators"].clear()  # Per-actuator tables belong to the cleared actuators
             self.switch_to_main_canvas()
 
     def clear_timeline_canvas(self):
@@ -3272,7 +3773,9 @@ class Haptics_App(QtWidgets.QMainWindow):
             if widget:
                 widget.deleteLater()
         self.timeline_widgets.clear()
+        self.cancel_segmentation(clips_only=True)  # Their clips are gone
         self.actuator_signals.clear()  # Clear the stored signals
+        self.clips_changed()
 
     def reset_color_management(self):
         # Reset color management stuff
@@ -3332,6 +3835,12 @@ class Haptics_App(QtWidgets.QMainWindow):
             # Update the actuator_signals dictionary to reflect the ID change
             if old_actuator_id in self.actuator_signals:
                 self.actuator_signals[new_actuator_id] = self.actuator_signals.pop(old_actuator_id)
+                self.clips_changed(old_actuator_id)
+                self.clips_changed(new_actuator_id)
+
+            # The calibration table follows the actuator as well
+            if old_actuator_id in self.actuator_calibration["actuators"]:
+                self.actuator_calibration["actuators"][new_actuator_id] = self.actuator_calibration["actuators"].pop(old_actuator_id)
 
             # Immediately update the plotter to reflect the changes
             self.update_plotter(new_actuator_id, actuator_type, color)
@@ -3346,6 +3855,8 @@ class Haptics_App(QtWidgets.QMainWindow):
         # Remove the associated signal data
         if actuator_id in self.actuator_signals:
             del self.actuator_signals[actuator_id]
+        self.clips_changed(actuator_id)
+        self.actuator_calibration["actuators"].pop(actuator_id, None)
 
     def import_waveform(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Import Waveform", "", "CSV Files (*.csv);;All Files (*)")
@@ -3364,32 +3875,65 @@ class Haptics_App(QtWidgets.QMainWindow):
                 if not ok:
                     return  # User canceled input, exit
 
-                # Read the CSV file
-                data = self.read_csv_file(file_path)
-                if sampling_rate != TIME_STAMP:
-                    current_signal_length = len(data)
-                    resample_factor = sampling_rate / TIME_STAMP
-                    data = np.interp(
-                        np.linspace(0, current_signal_length, int(current_signal_length / resample_factor)),
-                        np.arange(0, current_signal_length),
-                        data
-                    )
-                    sampling_rate = TIME_STAMP
-                print(f"CSV Data: {data}")  # Debugging print statement
-
-                # Extract the signal type from the CSV filename
-                signal_type = os.path.splitext(os.path.basename(file_path))[0]
-                print(f"Signal Type: {signal_type}")  # Debugging print statement
-                print("data length", len(data))
-                # Convert CSV data to the required format with the max value as gain
-                waveform_data = self.convert_csv_to_waveform_format(data, signal_type, sampling_rate)
-
+                waveform_data = self.read_waveform(file_path, sampling_rate)
                 if waveform_data:
                     self.add_imported_waveform(file_path, waveform_data)
 
             except Exception as e:
                 QMessageBox.critical(self, "Error", f"Failed to import waveform: {e}")
 
+    def import_waveform_folder(self):
+        """Import every CSV file of a folder, then segment them all in parallel."""
+        folder = QFileDialog.getExistingDirectory(self, "Import Waveform Folder")
+        if not folder:
+            return
+        sampling_rate, ok = QInputDialog.getInt(
+            self, "Sampling Rate Input", "Please enter the sampling rate of the files (in Hz):",
+            min=1, max=192000, value=44100
+        )
+        if not ok:
+            return
+
+        imported, failed = [], []
+        for file_name in sorted(os.listdir(folder)):
+            if not file_name.lower().endswith(".csv"):
+                continue
+            file_path = os.path.join(folder, file_name)
+            try:
+                waveform_data = self.read_waveform(file_path, sampling_rate)
+            except Exception as e:
+                failed.append(f"{file_name}: {e}")
+                continue
+            if waveform_data:
+                self.add_imported_waveform(file_path, waveform_data)
+                imported.append(os.path.basename(file_path))
+        if failed:
+            QMessageBox.warning(self, "Import Waveform Folder", "Some files could not be imported:\n" + "\n".join(failed))
+        if imported:
+            self.segment_imported_signals(imported)
+
+    def read_waveform(self, file_path, sampling_rate):
+        """Read a CSV waveform, resampled to the timeline rate, in the imported signal format."""
+        # Read the CSV file
+        data = self.read_csv_file(file_path)
+        if sampling_rate != TIME_STAMP:
+            current_signal_length = len(data)
+            resample_factor = sampling_rate / TIME_STAMP
+            data = np.interp(
+                np.linspace(0, current_signal_length, int(current_signal_length / resample_factor)),
+                np.arange(0, current_signal_length),
+                data
+            )
+            sampling_rate = TIME_STAMP
+        print(f"CSV Data: {data}")  # Debugging print statement
+
+        # Extract the signal type from the CSV filename
+        signal_type = os.path.splitext(os.path.basename(file_path))[0]
+        print(f"Signal Type: {signal_type}")  # Debugging print statement
+        print("data length", len(data))
+        # Convert CSV data to the required format with the max value as gain
+        return self.convert_csv_to_waveform_format(data, signal_type, sampling_rate)
+
     def read_csv_file(self, file_path):
         """
         Reads a CSV file and converts it to a list of rows.
@@ -3447,7 +3991,7 @@ class Haptics_App(QtWidgets.QMainWindow):
                         }
                     }
                 },
-                "data": csv_data  # CSV data as a list of rows
+                "data": to_storage(csv_data, self.signal_precision)  # CSV samples, a list or a float32 array
             }
 
             return waveform_format
@@ -3695,7 +4239,7 @@ class Haptics_App(QtWidgets.QMainWindow):
                         }
                     }
                 },
-                "data": self.maincanvas.current_signal.tolist()
+                "data": to_storage(self.maincanvas.current_signal, self.signal_precision)
             }
             
             if self.signal_exists(signal_data):
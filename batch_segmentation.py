@@ -0,0 +1,155 @@
+'''
+Parallel segmentation of a whole signal library.
+
+segment_batch spreads the signals over a ProcessPoolExecutor with one process per available
+core. The samples are not pickled to the workers: each signal is copied once into a shared
+memory block, the worker maps it as a NumPy array and writes both tracks into a second shared
+block that the caller reads back. BatchSegmentationTask runs a batch from the application
+QThreadPool so the GUI stays responsive, with the same progress and cancel signals as a
+SegmentationTask.
+'''
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+from PyQt6.QtCore import QRunnable
+
+from signal_segmentation_api import signal_segmentation_api, DEFAULT_FFT_WORKERS
+from segmentation_task import SegmentationCancelled, SegmentationTaskSignals, segment_tracks
+from signal_precision import dtype_of, to_storage, storage_precision
+from clip_tracks import track_length, quantize_tracks
+
+
+def available_cores():
+    """Cores this process may run on (the affinity mask where the platform has one)."""
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+def _segment_shared(input_name, output_name, length, dtype, mode, multirate):
+    """Worker process: segment the samples of one shared block into the (2, track_length(length)) output block."""
+    input_block = shared_memory.SharedMemory(name=input_name)
+    output_block = shared_memory.SharedMemory(name=output_name)
+    try:
+        samples = np.ndarray((length,), dtype=dtype, buffer=input_block.buf)
+        tracks = np.ndarray((2, track_length(length)), dtype=dtype, buffer=output_block.buf)
+        # One FFT thread per process, the processes already occupy every core
+        tracks[0], tracks[1] = segment_tracks(signal_segmentation_api(fft_workers=1), samples, mode, multirate)
+        del samples, tracks  # The views must be released before the blocks are closed
+    finally:
+        input_block.close()
+        output_block.close()
+
+
+def _release(block):
+    block.close()
+    block.unlink()
+
+
+def segment_batch(signals, mode, multirate, max_workers=None, progress=None, fft_workers=DEFAULT_FFT_WORKERS):
+    """
+    Segment {name: samples} in parallel.
+    Returns ({name: (high_freq, low_freq, duty, freq_index)}, {name: error}), stored like SegmentationTask results.
+    progress(done, total) is called after every signal and may raise to abort the batch.
+    fft_workers only applies when the batch runs in-process (one worker or one signal).
+    """
+    results, errors = {}, {}
+    max_workers = max_workers or available_cores()
+    pending = {name: samples for name, samples in signals.items() if len(samples)}
+    if max_workers == 1 or len(pending) == 1:
+        # Nothing to parallelize, spawning a worker would only add its start-up time
+        api = signal_segmentation_api(fft_workers)
+        for done, (name, samples) in enumerate(pending.items(), 1):
+            try:
+                high_freq_signal, low_freq_signal = segment_tracks(api, samples, mode, multirate)
+                precision = storage_precision(samples)
+                results[name] = (to_storage(high_freq_signal, precision), to_storage(low_freq_signal, precision),
+                                 *quantize_tracks(high_freq_signal, low_freq_signal))
+            except Exception as e:
+                errors[name] = str(e)
+            if progress:
+                progress(done, len(pending))
+        return results, errors
+
+    blocks = {}  # name -> (input block, output block, length, dtype)
+    # Spawned workers: forking the multi-threaded GUI process is not safe
+    context = multiprocessing.get_context("spawn")
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+            futures = {}
+            try:
+                for name, samples in pending.items():
+                    samples = np.asarray(samples, dtype=dtype_of(samples))  # float32 libraries stay float32
+                    input_block = shared_memory.SharedMemory(create=True, size=samples.nbytes)
+                    output_block = shared_memory.SharedMemory(create=True, size=max(1, 2 * track_length(len(samples)) * samples.itemsize))
+                    blocks[name] = (input_block, output_block, len(samples), samples.dtype)
+                    np.ndarray(samples.shape, dtype=samples.dtype, buffer=input_block.buf)[:] = samples
+                    futures[executor.submit(_segment_shared, input_block.name, output_block.name, len(samples),
+                                            samples.dtype.str, mode, multirate)] = name
+
+                for done, future in enumerate(as_completed(futures), 1):
+                    name = futures[future]
+                    input_block, output_block, length, dtype = blocks.pop(name)
+                    try:
+                        future.result()
+                        shared_tracks = np.ndarray((2, track_length(length)), dtype=dtype, buffer=output_block.buf)
+                        # Copied out: float32 storage keeps the array as is and the block is released below
+                        tracks = np.array(shared_tracks, copy=True)
+                        del shared_tracks
+                        precision = storage_precision(tracks)
+                        results[name] = (to_storage(tracks[0], precision), to_storage(tracks[1], precision),
+                                         *quantize_tracks(tracks[0], tracks[1]))
+                    except Exception as e:
+                        errors[name] = str(e)
+                    finally:
+                        _release(input_block)
+                        _release(output_block)
+                    if progress:
+                        progress(done, len(futures))
+            finally:
+                # Aborted: drop the queued signals, the running ones finish before the pool shuts down
+                for future in futures:
+                    future.cancel()
+    finally:
+        # Blocks of the signals not collected (cancelled batch, failure), once the pool has shut down
+        for input_block, output_block, _, _ in blocks.values():
+            _release(input_block)
+            _release(output_block)
+    return results, errors
+
+
+class BatchSegmentationTask(QRunnable):
+    """Runs segment_batch off the GUI thread, finished carries (results, errors)."""
+
+    def __init__(self, task_id, signals, mode, multirate, max_workers=None, fft_workers=DEFAULT_FFT_WORKERS):
+        super().__init__()
+        self.task_id = task_id
+        self.batch_signals = signals
+        self.mode = mode
+        self.multirate = multirate
+        self.max_workers = max_workers
+        self.fft_workers = fft_workers
+        self.cancel_requested = False
+        self.signals = SegmentationTaskSignals()
+
+    def cancel(self):
+        self.cancel_requested = True
+
+    def report(self, done, total):
+        if self.cancel_requested:
+            raise SegmentationCancelled()
+        self.signals.progress.emit(self.task_id, int(100 * done / max(total, 1)))
+
+    def run(self):
+        try:
+            outcome = segment_batch(self.batch_signals, self.mode, self.multirate, self.max_workers, self.report, self.fft_workers)
+        except SegmentationCancelled:
+            self.signals.cancelled.emit(self.task_id)
+        except Exception as e:
+            self.signals.failed.emit(self.task_id, str(e))
+        else:
+            self.signals.finished.emit(self.task_id, outcome)
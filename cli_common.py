@@ -0,0 +1,41 @@
+'''
+Helpers shared by the command-line players (headless_player.py, live_haptics.py).
+
+Qt-free: the transport to drive (the BLE device or a dry-run recorder) and the timing summaries
+of their reports.
+'''
+
+import statistics
+import time
+
+
+class DryRunTransport:
+    """Records the command lists instead of sending them."""
+
+    def __init__(self):
+        self.writes = []  # (perf_counter time, commands)
+
+    def send_command_list(self, commands):
+        self.writes.append((time.perf_counter(), commands))
+        return True
+
+
+def open_transport(device, dry_run):
+    """DryRunTransport, or python_ble_api connected to device (None, with a message, if that failed)."""
+    if dry_run:
+        return DryRunTransport()
+    from python_ble_api import python_ble_api  # Needs bleak, only imported for real playback
+    transport = python_ble_api()
+    if not transport.connect_ble_device(device):
+        print(f"Could not connect to {device}")
+        return None
+    return transport
+
+
+def timing_summary(values):
+    """Mean, 95th percentile and maximum of durations in seconds, formatted in milliseconds."""
+    if not values:
+        return "n/a"
+    values = sorted(value * 1000 for value in values)
+    p95 = values[min(len(values) - 1, int(0.95 * len(values)))]
+    return f"mean {statistics.fmean(values):.3f}, p95 {p95:.3f}, max {values[-1]:.3f}"
@@ -0,0 +1,52 @@
+'''
+Interval index over the clips of the timeline.
+
+Finding the clips that contain a time position used to scan every clip of every actuator.
+The index keeps, per actuator, the clip start times in sorted order together with the running
+maximum of their stop times, so the active clips of an actuator are found with two binary
+searches whatever the number of clips. An actuator entry is rebuilt lazily after its clips
+were edited (Haptics_App.clips_changed) or when its signal list was replaced.
+'''
+
+from bisect import bisect_left, bisect_right
+
+
+class ClipIndex:
+    def __init__(self):
+        self.entries = {}  # actuator_id -> (signals, order, starts, stops, reach)
+
+    def invalidate(self, actuator_id=None):
+        """Forget the entry of one actuator, or of every actuator when actuator_id is None."""
+        if actuator_id is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(actuator_id, None)
+
+    def entry(self, actuator_id, signals):
+        """Sorted arrays of one actuator, rebuilt when missing or when the signal list is a new list."""
+        entry = self.entries.get(actuator_id)
+        if entry is None or entry[0] is not signals:
+            order = sorted(range(len(signals)), key=lambda i: signals[i]["start_time"])
+            starts = [signals[i]["start_time"] for i in order]
+            stops = [signals[i]["stop_time"] for i in order]
+            # reach[k]: latest stop time among the first k + 1 clips (non-decreasing, so it can be bisected)
+            reach = []
+            for stop_time in stops:
+                reach.append(max(stop_time, reach[-1]) if reach else stop_time)
+            entry = (signals, order, starts, stops, reach)
+            self.entries[actuator_id] = entry
+        return entry
+
+    def active(self, actuator_id, signals, time_position):
+        """Indices in signals of the clips with start_time <= time_position <= stop_time, in list order."""
+        _, order, starts, stops, reach = self.entry(actuator_id, signals)
+        last = bisect_right(starts, time_position)  # Clips starting at or before the position
+        first = bisect_left(reach, time_position)  # Clips before this one all stopped earlier
+        return sorted(order[k] for k in range(first, last) if stops[k] >= time_position)
+
+    def is_active(self, actuator_id, signals, time_position):
+        """Whether any clip of the actuator contains time_position."""
+        _, _, starts, stops, reach = self.entry(actuator_id, signals)
+        last = bisect_right(starts, time_position)
+        first = bisect_left(reach, time_position)
+        return any(stops[k] >= time_position for k in range(first, last))
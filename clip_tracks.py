@@ -0,0 +1,98 @@
+'''
+Envelope tracks of the timeline clips.
+
+The frequency (high_freq) and intensity (low_freq) tracks of a clip are computed at the
+segmentation rate and are now stored at that rate, with the rate in the clip's "track_rate"
+field, instead of being interpolated to one value per 44.1 kHz sample: playback only reads them
+every 1/control_rate seconds, so the full-rate copies were 220 times larger than anything could
+use. Trims slice the tracks by time (slice_track), display upsamples them on the fly
+(display_track), and designs saved with full-rate tracks are converted on load (migrate_clip).
+
+Next to the float tracks a clip keeps them pre-quantized for the motors: "duty" (uint8 0-15) and
+"freq_index" (uint8 0-7, index in FREQUENCY_SET), at the same rate. They are produced together
+with the float tracks by the segmentation and let the playback compile a clip with an integer
+gather instead of quantizing every sample again.
+
+Qt-free, shared by the editor, the segmentation workers and the headless player.
+'''
+
+import numpy as np
+
+from signal_precision import to_storage, storage_precision
+from playback_engine import quantize_duty, quantize_frequency
+
+# Sampling rate of the clip signals (utils.TIME_STAMP, not imported: utils loads Qt and this
+# module is part of the headless import chain)
+TIME_STAMP = 44100
+# Rate of the stored tracks (Hz): the downsample rate of the segmentation, one value every 5 ms
+TRACK_RATE = 200
+# Rate of the tracks of clips saved before the rate was stored: one value per signal sample
+LEGACY_TRACK_RATE = TIME_STAMP
+# Clip fields of the pre-quantized tracks
+QUANTIZED_TRACKS = ("duty", "freq_index")
+
+
+def track_length(n_samples, rate=TRACK_RATE, sampling_rate=TIME_STAMP):
+    """Number of track values covering n_samples signal samples (same count as the multi-rate segmentation)."""
+    return -(-int(n_samples) * int(rate) // int(sampling_rate))
+
+
+def track_rate(clip):
+    return clip.get("track_rate", LEGACY_TRACK_RATE)
+
+
+def decimate_track(track, rate=TRACK_RATE, source_rate=TIME_STAMP):
+    """Values of a source_rate track at the times of a rate track (every source_rate/rate samples)."""
+    track = np.asarray(track)
+    if len(track) == 0:
+        return track
+    indices = (np.arange(track_length(len(track), rate, source_rate)) * int(source_rate)) // int(rate)
+    return track[np.minimum(indices, len(track) - 1)]
+
+
+def slice_track(track, rate, start_offset, stop_offset=None):
+    """
+    Part of a track between two offsets (seconds from its first value, None: to the end). A
+    non-empty track always keeps at least one value, so a trimmed clip shorter than 1/rate s still plays.
+    """
+    first = min(int(start_offset * rate), max(len(track) - 1, 0))
+    last = None if stop_offset is None else max(first + 1, int(stop_offset * rate))
+    return track[first:last]
+
+
+def display_track(track, rate, n_samples, sampling_rate=TIME_STAMP):
+    """Track linearly interpolated to n_samples signal samples, for drawing it under the waveform."""
+    if len(track) == 0:
+        return np.zeros(n_samples)
+    return np.interp(np.arange(n_samples) / sampling_rate, np.arange(len(track)) / rate, np.asarray(track, dtype=np.float64))
+
+
+def quantize_tracks(high_freq, low_freq):
+    """
+    (duty, freq_index) uint8 tracks of the float tracks, with the rules of
+    HapticCommandManager.map_amplitude_to_duty and map_frequency_to_freq_param.
+    """
+    return quantize_duty(low_freq), quantize_frequency(high_freq)
+
+
+def migrate_clip(clip):
+    """
+    Bring a clip saved by an older version up to date, in place: tracks saved before track_rate
+    existed are decimated to TRACK_RATE (same storage type) and missing quantized tracks are computed.
+    """
+    if "track_rate" not in clip:
+        for name in ("high_freq", "low_freq"):
+            if clip.get(name) is not None:
+                clip[name] = to_storage(decimate_track(clip[name], TRACK_RATE, LEGACY_TRACK_RATE), storage_precision(clip[name]))
+        clip["track_rate"] = TRACK_RATE
+    if clip.get("duty") is None and clip.get("high_freq") is not None and clip.get("low_freq") is not None:
+        clip["duty"], clip["freq_index"] = quantize_tracks(clip["high_freq"], clip["low_freq"])
+    return clip
+
+
+def migrate_signals(actuator_signals):
+    """migrate_clip every clip of {actuator_id: [clip, ...]}."""
+    for signals in actuator_signals.values():
+        for clip in signals:
+            migrate_clip(clip)
+    return actuator_signals
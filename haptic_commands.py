@@ -0,0 +1,145 @@
+'''
+Conversion of actuator states into motor commands for the BLE transport.
+
+Qt-free so the same command path is used by the GUI playback worker and by the headless player.
+The transport only needs a send_command_list(commands) method (python_ble_api, or a dry-run recorder).
+'''
+
+import time
+
+
+class HapticCommandManager:
+    MAX_COMMANDS_PER_PACKET = 20  # python_ble_api writes at most 20 commands (60 bytes) per packet
+
+    def __init__(self, ble_api, verbose=True):
+        self.ble_api = ble_api
+        self.verbose = verbose  # Print every sent command list (off for the headless players, it slows the send path)
+        self.is_playing = False
+        self.CHAIN_JUMP_INDEX = 16
+        self.active_actuators = set()
+        self.motor_state = {}  # actuator_id -> (duty, freq) last sent to each running actuator
+        self.last_sent_commands = [] # for the end of the slider use
+
+
+    def detect_leaving_edges(self, current_amplitudes):
+        current_actuators = set(current_amplitudes.keys())
+        leaving_edges = self.active_actuators - current_actuators
+        stop_commands = [
+            self.prepare_command(actuator_id, 0, 0, 0)  # Prepare stop command
+            for actuator_id in leaving_edges
+        ]
+        self.active_actuators = current_actuators
+        return stop_commands
+
+    def actuator_id_to_addr(self, actuator_id):
+        chain, index = actuator_id.split('.')
+        return (ord(chain) - ord('A')) * self.CHAIN_JUMP_INDEX + int(index) - 1
+
+    def map_amplitude_to_duty(self, amplitude):
+        # Map amplitude from 0 to 1 to 0 to 15
+        return int(round(amplitude * 15))
+
+
+    def map_frequency_to_freq_param(self, frequency):
+        # Define the frequency set
+        frequency_set = [123, 145, 170, 200, 235, 275, 322, 384]
+        
+        # Find the closest frequency in the set
+        closest_freq = min(frequency_set, key=lambda x: abs(x - frequency))
+        
+        # Return the index of the closest frequency
+        return frequency_set.index(closest_freq)
+
+    def prepare_command(self, actuator_id, amplitude, frequency, start_or_stop=1):
+        return {
+            'addr': self.actuator_id_to_addr(actuator_id),
+            'duty': self.map_amplitude_to_duty(amplitude),
+            'freq': self.map_frequency_to_freq_param(frequency),
+            'start_or_stop': start_or_stop
+        }  # 1 for start
+
+    def send_packed(self, commands):
+        """Send a command list in as few BLE packets as possible."""
+        for i in range(0, len(commands), self.MAX_COMMANDS_PER_PACKET):
+            self.ble_api.send_command_list(commands[i:i + self.MAX_COMMANDS_PER_PACKET])
+
+    def process_commands(self, commands):
+        commands.sort(key=lambda cmd: cmd["addr"])
+        if commands != None and self.is_playing:
+            self.send_packed(commands)  # Send the list of commands
+            self.last_sent_commands = commands  # Log the last sent commands
+            if self.verbose:
+                print(f"Sending command list at Time {time.perf_counter()}: {commands}")
+
+    def start_playback(self):
+        self.is_playing = True
+
+    def stop_playback(self):
+        self.is_playing = False
+        # Generate stop commands for all active actuators based on the current active signals
+        stop_commands = [
+            {"addr": self.actuator_id_to_addr(actuator_id), "duty": 0, "freq": 0, "start_or_stop": 0}
+            for actuator_id in self.active_actuators
+        ]
+        # sort the stop_commands by addr in a increasing order
+        stop_commands.sort(key=lambda cmd: cmd["addr"])
+        
+        # Send STOP commands to the actuators
+        if stop_commands:
+            self.send_packed(stop_commands)  # Send the list of stop commands
+            self.last_sent_commands = stop_commands  # Log the last sent stop commands
+            if self.verbose:
+                print(f"[Play Button Stopping] Sending stop command list at {time.time()}: {stop_commands}")
+        
+        # Clear active actuators and active signals after sending the stop commands
+        self.active_actuators.clear()
+        self.motor_state.clear()
+
+
+    def update(self, current_amplitudes):
+        """Update the playing signals if there is a change."""
+        # Detect leaving edges and generate stop commands
+        stop_commands = self.detect_leaving_edges(current_amplitudes)
+
+        # Prepare all commands for active actuators, ensuring we handle None parameters safely
+        active_commands = []
+        for actuator_id, signal_details in current_amplitudes.items():
+            active_commands.append(self.prepare_command(actuator_id, signal_details["current_amplitude"], signal_details["current_frequency"], 1))
+
+        all_commands = stop_commands + active_commands
+        # Process the commands (not time-guarded)
+        self.process_commands(all_commands)
+
+    def dispatch_events(self, events):
+        """Send the state changes returned by the PlaybackEngine as one command list."""
+        commands = []
+        for actuator_id, duty, freq, start_or_stop in events:
+            commands.append({
+                'addr': self.actuator_id_to_addr(actuator_id),
+                'duty': duty,
+                'freq': freq,
+                'start_or_stop': start_or_stop
+            })
+            # Keep track of running actuators so stop_playback can silence them
+            if start_or_stop:
+                self.active_actuators.add(actuator_id)
+                self.motor_state[actuator_id] = (duty, freq)
+            else:
+                self.active_actuators.discard(actuator_id)
+                self.motor_state.pop(actuator_id, None)
+        if commands:
+            self.process_commands(commands)
+
+    def apply_state(self, target_state):
+        """
+        Bring the motors to target_state ({actuator_id: (duty, freq)} of the running actuators) after a seek.
+        Only the difference with the last known motor state is sent: actuators that should be silent are
+        stopped, actuators whose duty/freq changed are restarted, the others are left alone.
+        """
+        events = [(actuator_id, 0, 0, 0) for actuator_id in self.motor_state if actuator_id not in target_state]
+        events += [
+            (actuator_id, duty, freq, 1)
+            for actuator_id, (duty, freq) in target_state.items()
+            if self.motor_state.get(actuator_id) != (duty, freq)
+        ]
+        self.dispatch_events(events)
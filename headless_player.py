@@ -0,0 +1,171 @@
+'''
+Headless playback of saved designs, for kiosk boxes without a display.
+
+Loads a .dsgn file without Qt, compiles it with the same PlaybackEngine and HapticCommandManager
+as the GUI, and drives the transport from a plain asyncio loop that sleeps until the next
+actuator state change.
+
+    python headless_player.py design.dsgn --device "QT Py ESP32-S3"
+    python headless_player.py design.dsgn --loop --loop-region 2.0 6.5 --rate 100
+    python headless_player.py design.dsgn --dry-run --start 1.5
+
+--dry-run sends nothing and prints a timing report of when every write would have happened.
+'''
+
+import argparse
+import asyncio
+import pickle
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from playback_engine import PlaybackEngine, DEFAULT_CONTROL_RATE, MAX_CONTROL_RATE
+from haptic_commands import HapticCommandManager
+from actuator_calibration import compile_calibration
+from clip_tracks import migrate_signals
+from cli_common import open_transport, timing_summary
+
+
+class _QtStub:
+    """Stand-in for the PyQt objects (QColor...) pickled with the GUI state of a design."""
+
+    def __init__(self, *args, **kwargs):
+        self.args = args
+
+    def __setstate__(self, state):
+        self.state = state
+
+
+class DesignUnpickler(pickle.Unpickler):
+    """
+    Only rebuilds plain containers and NumPy arrays; PyQt classes are replaced by _QtStub so
+    designs load without Qt, and any other global is refused.
+    """
+    ALLOWED_GLOBALS = {
+        ("numpy", "ndarray"), ("numpy", "dtype"),
+        ("numpy.core.multiarray", "_reconstruct"), ("numpy.core.multiarray", "scalar"),
+        ("numpy._core.multiarray", "_reconstruct"), ("numpy._core.multiarray", "scalar"),
+        ("builtins", "complex"), ("builtins", "set"), ("builtins", "frozenset"), ("builtins", "slice"),
+        ("collections", "OrderedDict"),
+    }
+
+    def find_class(self, module, name):
+        if module.split(".")[0] == "PyQt6":
+            return _QtStub
+        if (module, name) in self.ALLOWED_GLOBALS:
+            return super().find_class(module, name)
+        raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from a design file")
+
+
+def load_design(file_name):
+    """Return (actuator_signals, calibration_luts) of a saved design."""
+    with open(file_name, 'rb') as file:
+        design_data = DesignUnpickler(file).load()
+    actuator_signals = migrate_signals(design_data.get('actuator_signals', {}))  # Older designs store 44.1 kHz tracks
+    actuator_types = {actuator['id']: actuator['type'] for actuator in design_data.get('actuators', [])}
+    calibration_luts = compile_calibration(design_data.get('calibration'), actuator_types)
+    return actuator_signals, calibration_luts
+
+
+class HeadlessPlayer:
+    """Plays a compiled design on a transport from an asyncio loop."""
+
+    def __init__(self, transport, control_rate=DEFAULT_CONTROL_RATE, lookahead=0.0):
+        self.engine = PlaybackEngine(control_rate)
+        self.haptic_manager = HapticCommandManager(transport, verbose=False)
+        self.lookahead = lookahead  # Seconds, commands are sent this much ahead of their timeline time
+        self.lateness = []  # Seconds between each intended wake-up and the actual one
+        self.write_times = []  # Seconds spent in each transport write
+
+    def load(self, actuator_signals, calibration_luts=None, loop_region=None):
+        self.engine.set_loop(loop_region)
+        self.engine.load(actuator_signals, calibration_luts)
+
+    async def play(self, start_time=0.0, max_duration=None):
+        """
+        Play from start_time until the end of the design, or for max_duration seconds (needed to
+        end a loop). The actuators are always silenced on exit, also when the task is cancelled.
+        """
+        origin = time.perf_counter() - start_time
+        # Transport writes block (python_ble_api waits for the BLE write), they run on one writer
+        # thread so the loop keeps serving other tasks and cancellation; one thread keeps them in order
+        writer = ThreadPoolExecutor(max_workers=1)
+        loop = asyncio.get_running_loop()
+        self.haptic_manager.start_playback()
+        try:
+            await loop.run_in_executor(writer, self.haptic_manager.apply_state, self.engine.seek(start_time + self.lookahead))
+            while True:
+                deadline = self.engine.next_deadline()
+                if deadline is None:
+                    break
+                wake_target = deadline - self.lookahead
+                if max_duration is not None and wake_target - start_time > max_duration:
+                    break
+                delay = origin + wake_target - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                now = time.perf_counter() - origin
+                self.lateness.append(now - wake_target)
+                events = self.engine.pop_due(now + self.lookahead)
+                if events:
+                    write_start = time.perf_counter()
+                    await loop.run_in_executor(writer, self.haptic_manager.dispatch_events, events)
+                    self.write_times.append(time.perf_counter() - write_start)
+            if max_duration is not None:
+                await asyncio.sleep(max(0.0, origin + start_time + max_duration - time.perf_counter()))
+        finally:
+            await loop.run_in_executor(writer, self.haptic_manager.stop_playback)
+            writer.shutdown()
+
+    def timing_report(self):
+        """Summary of the wake-up lateness and write durations, in milliseconds."""
+        return "\n".join([
+            f"Design duration: {self.engine.duration:.3f} s, loop: {self.engine.loop}",
+            f"Wake-ups: {len(self.lateness)}, writes: {len(self.write_times)}",
+            f"Wake-up lateness (ms): {timing_summary(self.lateness)}",
+            f"Write time (ms): {timing_summary(self.write_times)}",
+        ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play a saved haptic design without the GUI.")
+    parser.add_argument("design", help="Design file (.dsgn) saved by the editor")
+    parser.add_argument("--device", help="Name of the BLE device to connect to")
+    parser.add_argument("--dry-run", action="store_true", help="Send nothing and print a timing report")
+    parser.add_argument("--loop", action="store_true", help="Loop the design (stop with Ctrl+C or --duration)")
+    parser.add_argument("--loop-region", nargs=2, type=float, metavar=("START", "STOP"), help="Loop only this region (seconds)")
+    parser.add_argument("--start", type=float, default=0.0, help="Start offset in seconds")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--rate", type=int, default=DEFAULT_CONTROL_RATE, help=f"Control rate in Hz (max {MAX_CONTROL_RATE})")
+    parser.add_argument("--lookahead", type=float, default=0.0, help="Send commands this many milliseconds early")
+    args = parser.parse_args(argv)
+
+    if not args.dry_run and not args.device:
+        parser.error("--device is required unless --dry-run is given")
+
+    actuator_signals, calibration_luts = load_design(args.design)
+    loop_region = None
+    if args.loop_region:
+        loop_region = tuple(args.loop_region)
+    elif args.loop:
+        loop_region = (0.0, None)
+
+    transport = open_transport(args.device, args.dry_run)
+    if transport is None:
+        return 1
+
+    player = HeadlessPlayer(transport, min(max(1, args.rate), MAX_CONTROL_RATE), args.lookahead / 1000)
+    player.load(actuator_signals, calibration_luts, loop_region)
+    try:
+        asyncio.run(player.play(args.start, args.duration))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if not args.dry_run:
+            transport.disconnect_ble_device()
+    print(player.timing_report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+'''
+Live audio-to-haptics streaming, without the GUI.
+
+Reads PCM blocks from a file, a named pipe or stdin and drives the actuators while the audio
+arrives. Every block updates a trailing analysis window: its dominant frequency is tracked with
+the same signal_segmentation_api frame analysis as the offline segmentation (Goertzel bank over
+the hardware frequencies by default) and its envelope is the RMS amplitude of the window. The
+state is quantized like a compiled design (quantize_duty / quantize_frequency) and only the
+changes are sent through the HapticCommandManager. Processing is causal: a block never waits for
+later audio, so the added delay is bounded by one block plus half of the analysis window.
+
+    arecord -f S16_LE -r 44100 -c 1 | python live_haptics.py - --device "QT Py ESP32-S3" --actuators A.1 A.2
+    python live_haptics.py music.wav --dry-run
+    python live_haptics.py capture.raw --format f32le --rate 48000 --channels 2 --dry-run --no-realtime
+
+WAV input is recognized by its header; anything else is read as raw PCM with --format, --rate
+and --channels. Regular files are paced at the audio rate (--realtime, the default) so they stand
+in for a live source. On exit a report gives the audio-to-command latency: the time from the
+moment a block was available (its last sample arrived) to the return of the transport write.
+'''
+
+import argparse
+import io
+import os
+import sys
+import time
+import wave
+
+import numpy as np
+
+from haptic_commands import HapticCommandManager
+from cli_common import open_transport, timing_summary
+from playback_engine import quantize_duty, quantize_frequency
+from signal_segmentation_api import signal_segmentation_api, MODE_GOERTZEL, SEGMENTATION_MODES
+
+DEFAULT_BLOCK_DURATION = 0.010  # Seconds of audio per block
+DEFAULT_WINDOW_DURATION = 0.040  # Seconds of audio in the analysis window (25 Hz resolution)
+
+# Raw PCM sample formats: (NumPy dtype, full scale)
+PCM_FORMATS = {
+    "s16le": ("<i2", 32768.0),
+    "s32le": ("<i4", 2147483648.0),
+    "f32le": ("<f4", 1.0),
+}
+# WAV sample widths (bytes) handled by PCMReader: (NumPy dtype, offset, full scale)
+WAV_FORMATS = {
+    1: ("u1", 128.0, 128.0),
+    2: ("<i2", 0.0, 32768.0),
+    4: ("<i4", 0.0, 2147483648.0),
+}
+
+
+class PCMReader:
+    """Mono float blocks in [-1, 1] from a raw PCM or WAV byte stream (channels are averaged)."""
+
+    def __init__(self, stream, sampling_rate=44100, channels=1, sample_format="s16le"):
+        if not hasattr(stream, "peek"):
+            stream = io.BufferedReader(stream)
+        self.wav = None
+        if stream.peek(4)[:4] == b"RIFF":
+            self.wav = wave.open(stream, "rb")
+            if self.wav.getsampwidth() not in WAV_FORMATS:
+                raise ValueError(f"Unsupported WAV sample width: {8 * self.wav.getsampwidth()} bits")
+            self.sampling_rate = self.wav.getframerate()
+            self.channels = self.wav.getnchannels()
+            self.dtype, self.offset, self.scale = WAV_FORMATS[self.wav.getsampwidth()]
+        else:
+            if sample_format not in PCM_FORMATS:
+                raise ValueError(f"Unsupported PCM format: {sample_format}")
+            self.sampling_rate = int(sampling_rate)
+            self.channels = int(channels)
+            self.dtype, self.scale = PCM_FORMATS[sample_format]
+            self.offset = 0.0
+        self.stream = stream
+        self.frame_bytes = np.dtype(self.dtype).itemsize * self.channels
+
+    def read_block(self, block_size):
+        """Next block_size samples (fewer at the end of the stream), None once the stream is exhausted."""
+        if self.wav is not None:
+            data = self.wav.readframes(block_size)
+        else:
+            data = self.stream.read(block_size * self.frame_bytes)  # Blocks until the whole block arrived
+        usable = len(data) - len(data) % self.frame_bytes
+        if usable == 0:
+            return None
+        samples = np.frombuffer(data[:usable], dtype=self.dtype).astype(np.float64)
+        samples = (samples - self.offset) / self.scale
+        return samples.reshape(-1, self.channels).mean(axis=1)
+
+
+class LiveHapticsStreamer:
+    """
+    Incremental frequency/intensity tracking of an audio stream, sent to the actuators block by block.
+    All actuators receive the same state; a silent window (duty 0) stops them.
+    """
+
+    def __init__(self, transport, actuator_ids, sampling_rate, window_duration=DEFAULT_WINDOW_DURATION,
+                 threshold=102, mode=MODE_GOERTZEL, gain=1.0):
+        self.segmentation_api = signal_segmentation_api(fft_workers=1)  # One window per call, threads would only add overhead
+        self.haptic_manager = HapticCommandManager(transport, verbose=False)
+        self.actuator_ids = list(actuator_ids)
+        self.sampling_rate = int(sampling_rate)
+        self.threshold = threshold
+        self.mode = mode
+        self.gain = gain
+        self.window = np.zeros(max(2, int(round(window_duration * self.sampling_rate))))
+        self.n_input = 0
+        self.latencies = []  # Seconds from block arrival to the end of its transport write
+        self.processing_times = []  # Seconds spent analyzing each block (with or without a write)
+        self.block_sizes = []
+
+    def start(self):
+        self.haptic_manager.start_playback()
+
+    def stop(self):
+        self.haptic_manager.stop_playback()
+
+    def analyze(self, block):
+        """Slide the window over the block and return its (frequency, intensity)."""
+        if len(block) >= len(self.window):
+            self.window[:] = block[-len(self.window):]
+        else:
+            self.window[:-len(block)] = self.window[len(block):]
+            self.window[-len(block):] = block
+        self.n_input += len(block)
+
+        high_freq, dominant = self.segmentation_api.frame_dominant_frequency(
+            self.window[None, :], self.sampling_rate, self.threshold, self.mode)
+        if dominant[0] < self.threshold:
+            # Low-frequency content follows the raw magnitude, like the offline segmentation
+            return 0.0, min(1.0, self.gain * abs(block[-1]))
+        # RMS of the window, scaled so a full-scale sine gives 1 (offline: sqrt(2 * lowpass(x^2)))
+        return float(high_freq[0]), min(1.0, self.gain * float(np.sqrt(2 * np.mean(self.window ** 2))))
+
+    def process_block(self, block, arrival_time):
+        """Analyze a block that became available at arrival_time (perf_counter) and send the new state."""
+        process_start = time.perf_counter()
+        frequency, intensity = self.analyze(block)
+        duty, freq = int(quantize_duty(intensity)), int(quantize_frequency(frequency))
+        target_state = {actuator_id: (duty, freq) for actuator_id in self.actuator_ids} if duty > 0 else {}
+        changed = target_state != self.haptic_manager.motor_state
+        if changed:
+            self.haptic_manager.apply_state(target_state)
+        done = time.perf_counter()
+        self.processing_times.append(done - process_start)
+        self.block_sizes.append(len(block))
+        if changed:
+            self.latencies.append(done - arrival_time)
+        return duty, freq
+
+    def run(self, reader, block_size, realtime=False, max_duration=None):
+        """
+        Stream the reader to the actuators until it is exhausted or max_duration seconds of audio were
+        played. realtime paces the blocks at the audio rate (for file stand-ins); otherwise a block is
+        considered available as soon as the read returns. The actuators are always silenced on exit.
+        """
+        origin = time.perf_counter()
+        self.start()
+        try:
+            while max_duration is None or self.n_input < max_duration * self.sampling_rate:
+                block = reader.read_block(block_size)
+                if block is None:
+                    break
+                if realtime:
+                    # The last sample of the block is due once the audio before it has played
+                    arrival_time = origin + (self.n_input + len(block)) / self.sampling_rate
+                    delay = arrival_time - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                else:
+                    arrival_time = time.perf_counter()
+                self.process_block(block, arrival_time)
+        finally:
+            self.stop()
+
+    def latency_report(self):
+        """Summary of the audio-to-command latency and of the per-block processing time, in milliseconds."""
+        block_duration = 1000 * max(self.block_sizes, default=0) / self.sampling_rate
+        window_delay = 1000 * len(self.window) / 2 / self.sampling_rate
+        return "\n".join([
+            f"Audio: {self.n_input / self.sampling_rate:.3f} s at {self.sampling_rate} Hz, "
+            f"blocks: {len(self.block_sizes)}, writes: {len(self.latencies)}",
+            f"Block duration: {block_duration:.3f} ms, analysis window delay: {window_delay:.3f} ms",
+            f"Processing time per block (ms): {timing_summary(self.processing_times)}",
+            f"Audio-to-command latency (ms): {timing_summary(self.latencies)}",
+        ])
+
+
+def open_source(source):
+    """Binary stream of a path, a named pipe or '-' for stdin, and whether it is a regular file."""
+    if source == "-":
+        return sys.stdin.buffer, False
+    return open(source, "rb"), os.path.isfile(source)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive the actuators live from an audio stream.")
+    parser.add_argument("source", help="PCM or WAV file, named pipe, or - for stdin")
+    parser.add_argument("--device", help="Name of the BLE device to connect to")
+    parser.add_argument("--dry-run", action="store_true", help="Send nothing, only report the latency")
+    parser.add_argument("--actuators", nargs="+", default=["A.1"], help="Actuator ids driven by the stream (e.g. A.1 A.2)")
+    parser.add_argument("--format", choices=sorted(PCM_FORMATS), default="s16le", help="Raw PCM sample format")
+    parser.add_argument("--rate", type=int, default=44100, help="Raw PCM sampling rate in Hz")
+    parser.add_argument("--channels", type=int, default=1, help="Raw PCM channel count (averaged to mono)")
+    parser.add_argument("--block", type=float, default=1000 * DEFAULT_BLOCK_DURATION, help="Block duration in milliseconds")
+    parser.add_argument("--window", type=float, default=1000 * DEFAULT_WINDOW_DURATION, help="Analysis window in milliseconds")
+    parser.add_argument("--mode", choices=SEGMENTATION_MODES, default=MODE_GOERTZEL, help="Frequency tracking mode")
+    parser.add_argument("--threshold", type=float, default=102, help="Dominant frequency (Hz) below which the raw magnitude is used")
+    parser.add_argument("--gain", type=float, default=1.0, help="Intensity gain applied before quantization")
+    parser.add_argument("--realtime", action=argparse.BooleanOptionalAction, default=None,
+                        help="Pace the input at the audio rate (default: on for regular files)")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds of audio")
+    args = parser.parse_args(argv)
+
+    if not args.dry_run and not args.device:
+        parser.error("--device is required unless --dry-run is given")
+
+    stream, is_file = open_source(args.source)
+    try:
+        reader = PCMReader(stream, args.rate, args.channels, args.format)
+    except (ValueError, wave.Error) as e:
+        print(f"Could not read {args.source}: {e}")
+        return 1
+
+    transport = open_transport(args.device, args.dry_run)
+    if transport is None:
+        return 1
+
+    streamer = LiveHapticsStreamer(transport, args.actuators, reader.sampling_rate, args.window / 1000,
+                                   args.threshold, args.mode, args.gain)
+    block_size = max(1, int(round(args.block / 1000 * reader.sampling_rate)))
+    try:
+        streamer.run(reader, block_size, is_file if args.realtime is None else args.realtime, args.duration)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if not args.dry_run:
+            transport.disconnect_ble_device()
+        if stream is not sys.stdin.buffer:
+            stream.close()
+    print(streamer.latency_report())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
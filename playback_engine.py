@@ -0,0 +1,414 @@
+'''
+Event-driven playback engine for the timeline design.
+
+Instead of re-evaluating every actuator on a fixed tick, the design is compiled once into
+per-actuator lists of state changes (start, new duty/freq, stop). During playback a heap
+holds the next change time of every actuator, so the caller only has to sleep until the
+earliest deadline and send exactly the commands that became due.
+'''
+
+import heapq
+from types import MappingProxyType
+import numpy as np
+
+from signal_precision import dtype_of
+
+# The eight frequencies supported by the actuator firmware (index = freq parameter)
+FREQUENCY_SET = np.array([123, 145, 170, 200, 235, 275, 322, 384], dtype=np.float64)
+
+# Rate at which the envelope tracks of a clip are sampled, same cadence as the old 20 ms tick
+DEFAULT_CONTROL_RATE = 50
+# Highest useful control rate: the segmentation envelopes are downsampled to 200 Hz
+MAX_CONTROL_RATE = 200
+
+# Tolerance when converting between the caller clock and design time (loop offsets are sums of floats)
+TIME_EPSILON = 1e-9
+
+# How a clip layer combines with the layers below it ("sum" is clamped to 1)
+BLEND_MODES = ("max", "sum", "multiply")
+BLEND_MAX, BLEND_SUM, BLEND_MULTIPLY = range(len(BLEND_MODES))
+
+
+def quantize_duty(amplitudes):
+    """Vectorized HapticCommandManager.map_amplitude_to_duty: map [0, 1] to [0, 15]."""
+    return np.clip(np.rint(np.asarray(amplitudes, dtype=np.float64) * 15), 0, 15).astype(np.uint8)
+
+
+def quantize_frequency(frequencies):
+    """Vectorized HapticCommandManager.map_frequency_to_freq_param: index of the closest frequency."""
+    frequencies = np.asarray(frequencies, dtype=np.float64)
+    return np.argmin(np.abs(frequencies[..., None] - FREQUENCY_SET), axis=-1).astype(np.uint8)
+
+
+def quantize_calibrated(amplitudes, frequencies, luts):
+    """
+    Calibrated quantization with the lookup arrays built by actuator_calibration.compile_calibration.
+    luts is (duty_lut, frequency_lut): the duty lut is indexed by the amplitude scaled to its length,
+    the frequency lut by the frequency in whole Hz.
+    """
+    duty_lut, frequency_lut = luts
+    amplitude_index = np.clip(np.rint(np.asarray(amplitudes) * (len(duty_lut) - 1)), 0, len(duty_lut) - 1).astype(np.intp)
+    frequency_index = np.clip(np.rint(np.asarray(frequencies)), 0, len(frequency_lut) - 1).astype(np.intp)
+    return duty_lut[amplitude_index], frequency_lut[frequency_index]
+
+
+def _frozen_track(track):
+    """Copy an envelope or quantized track into a read-only array (None stays None)."""
+    if track is None:
+        return None
+    if isinstance(track, np.ndarray) and track.dtype == np.uint8:
+        track = np.array(track)  # Quantized duty / frequency index tracks
+    else:
+        track = np.array(track, dtype=dtype_of(track))  # float32 tracks stay float32
+    track.setflags(write=False)
+    return track
+
+
+def snapshot_design(actuator_signals, track_cache=None):
+    """
+    Take an immutable copy of the design ({actuator_id: [signal, ...]}) for playback on another thread.
+    Only the fields playback needs are kept, envelope tracks become read-only arrays, so later
+    edits in the GUI cannot change what is being played.
+
+    track_cache ({id(track): (track, frozen)}, owned by the caller) reuses the frozen copy of tracks
+    that were already snapshotted. Edits always replace a track with a new list, so an unchanged
+    track keeps its frozen array and the engine can skip recompiling the actuators that own it.
+    """
+    used = {}
+
+    def frozen(track):
+        if track is None or track_cache is None:
+            return _frozen_track(track)
+        entry = track_cache.get(id(track))
+        if entry is None:
+            entry = (track, _frozen_track(track))  # Holding the track keeps its id from being reused
+        used[id(track)] = entry
+        return entry[1]
+
+    snapshot = {}
+    for actuator_id, signals in actuator_signals.items():
+        snapshot[actuator_id] = tuple(
+            MappingProxyType({
+                "start_time": float(signal["start_time"]),
+                "stop_time": float(signal["stop_time"]),
+                "low_freq": frozen(signal.get("low_freq")),
+                "high_freq": frozen(signal.get("high_freq")),
+                "duty": frozen(signal.get("duty")),
+                "freq_index": frozen(signal.get("freq_index")),
+                "layer": signal.get("layer", 0),
+                "blend": signal.get("blend", BLEND_MODES[BLEND_MAX]),
+            })
+            for signal in signals
+        )
+    if track_cache is not None:
+        # Forget the tracks that are no longer part of the design
+        track_cache.clear()
+        track_cache.update(used)
+    return MappingProxyType(snapshot)
+
+
+def blend_code(mode):
+    """Index of a blend mode in BLEND_MODES, clips without a (known) mode blend with max."""
+    return BLEND_MODES.index(mode) if mode in BLEND_MODES else 0
+
+
+def mix_layers(amplitudes, frequencies, blend_codes):
+    """
+    Mix stacked clip layers in one vectorized pass.
+    amplitudes and frequencies have shape (n_layers, n_points), ordered bottom to top, with NaN where
+    a layer is not active. blend_codes (broadcastable to the same shape) tells how each layer combines
+    with what is below it: max, sum (clamped to 1) or multiply. The bottom-most active layer is taken
+    as is. Returns (amplitude, frequency, active) of shape (n_points,); the frequency is the one of
+    the loudest active layer.
+    """
+    amplitudes = np.asarray(amplitudes, dtype=np.float64)
+    frequencies = np.asarray(frequencies, dtype=np.float64)
+    blend_codes = np.broadcast_to(blend_codes, amplitudes.shape)
+    mixed = np.full(amplitudes.shape[1:], np.nan)
+    for layer_amplitudes, layer_codes in zip(amplitudes, blend_codes):
+        present = ~np.isnan(layer_amplitudes)
+        base = present & np.isnan(mixed)
+        mixed[base] = layer_amplitudes[base]
+        stacked = present & ~base
+        summed = stacked & (layer_codes == BLEND_SUM)
+        multiplied = stacked & (layer_codes == BLEND_MULTIPLY)
+        maxed = stacked & ~summed & ~multiplied
+        mixed[summed] = np.minimum(mixed[summed] + layer_amplitudes[summed], 1.0)
+        mixed[multiplied] = mixed[multiplied] * layer_amplitudes[multiplied]
+        mixed[maxed] = np.maximum(mixed[maxed], layer_amplitudes[maxed])
+
+    active = ~np.isnan(mixed)
+    loudest = np.argmax(np.where(np.isnan(amplitudes), -np.inf, amplitudes), axis=0)
+    frequency = np.take_along_axis(frequencies, loudest[None], axis=0)[0]
+    return np.where(active, mixed, 0.0), np.where(active, frequency, 0.0), active
+
+
+def _mix_clips(clips, spans, columns):
+    """mix_layers of the float tracks of the clips at the sample times selected by the columns mask."""
+    position = np.cumsum(columns) - 1  # Column of every selected sample time
+    amplitudes = np.full((len(clips), int(np.count_nonzero(columns))), np.nan)
+    frequencies = np.full(amplitudes.shape, np.nan)
+    for row, ((lo, hi, indices), clip) in enumerate(zip(spans, clips)):
+        selected = columns[lo:hi]
+        amplitudes[row, position[lo:hi][selected]] = clip[3][indices[selected]]
+        frequencies[row, position[lo:hi][selected]] = clip[4][indices[selected]]
+    blend_codes = np.array([[blend_code(clip[2].get("blend"))] for clip in clips])
+    return mix_layers(amplitudes, frequencies, blend_codes)
+
+
+def compile_actuator_events(signals, control_rate=DEFAULT_CONTROL_RATE, luts=None):
+    """
+    Compile the clips of one actuator into a single sorted list of state changes.
+    Returns (times, on, duty, freq) arrays. Every clip is sampled every 1/control_rate seconds from
+    its own start (same indexing as Haptics_App.update_current_amplitudes) and at its exact stop time.
+    Where a single clip plays, its pre-quantized duty / freq_index tracks are gathered directly.
+    Overlapping clips (and every clip when calibration luts are given, or when a clip has no
+    quantized tracks) are mixed layer by layer with mix_layers and quantized, through the luts when
+    given. An event is kept only where the state of the actuator changes.
+    """
+    clips = []
+    for index, signal in enumerate(signals):
+        if signal.get("low_freq") is None or signal.get("high_freq") is None:
+            continue
+        low_freq = np.asarray(signal["low_freq"], dtype=dtype_of(signal["low_freq"]))
+        high_freq = np.asarray(signal["high_freq"], dtype=dtype_of(signal["high_freq"]))
+        track_length = min(len(low_freq), len(high_freq))
+        if track_length == 0 or signal["stop_time"] <= signal["start_time"]:
+            continue
+        duty_track, freq_track = signal.get("duty"), signal.get("freq_index")
+        if duty_track is None or freq_track is None or min(len(duty_track), len(freq_track)) < track_length:
+            duty_track = freq_track = None
+        else:
+            duty_track, freq_track = np.asarray(duty_track, dtype=np.uint8), np.asarray(freq_track, dtype=np.uint8)
+        clips.append((signal.get("layer", 0), index, signal, low_freq, high_freq, track_length, duty_track, freq_track))
+    if not clips:
+        return None
+    clips.sort(key=lambda clip: clip[:2])  # Bottom layer first, then in the order they were added
+
+    # Sample times: the control grid of every clip plus its exact stop time
+    grids = []
+    for signal in (clip[2] for clip in clips):
+        duration = signal["stop_time"] - signal["start_time"]
+        offsets = np.arange(int(np.ceil(duration * control_rate))) / control_rate
+        grids.append(signal["start_time"] + offsets[offsets < duration])
+        grids.append([signal["stop_time"]])
+    times = np.unique(np.concatenate(grids))
+
+    # Sample times covered by every clip ([lo, hi) in times) and the track value read at each
+    spans = []
+    for _, _, signal, _, _, track_length, _, _ in clips:
+        start_time, stop_time = signal["start_time"], signal["stop_time"]
+        lo, hi = np.searchsorted(times, [start_time, stop_time], side='left')
+        relative_position = (times[lo:hi] - start_time) / (stop_time - start_time)
+        spans.append((lo, hi, np.minimum((relative_position * track_length).astype(np.int64), track_length - 1)))
+
+    if luts is None and all(clip[6] is not None for clip in clips):
+        # Integer gather of the quantized tracks, only the samples where clips overlap are mixed
+        layer_count = np.zeros(len(times), dtype=np.int64)
+        duty = np.zeros(len(times), dtype=np.uint8)
+        freq = np.zeros(len(times), dtype=np.uint8)
+        for (lo, hi, indices), clip in zip(spans, clips):
+            layer_count[lo:hi] += 1
+            duty[lo:hi] = clip[6][indices]
+            freq[lo:hi] = clip[7][indices]
+        on = layer_count > 0
+        overlapping = layer_count > 1
+        if overlapping.any():
+            amplitude, frequency, _ = _mix_clips(clips, spans, overlapping)
+            duty[overlapping], freq[overlapping] = quantize_duty(amplitude), quantize_frequency(frequency)
+    else:
+        amplitude, frequency, on = _mix_clips(clips, spans, np.ones(len(times), dtype=bool))
+        if luts is not None:
+            duty, freq = quantize_calibrated(amplitude, frequency, luts)
+        else:
+            duty, freq = quantize_duty(amplitude), quantize_frequency(frequency)
+    duty = np.where(on, duty, 0).astype(np.uint8)
+    freq = np.where(on, freq, 0).astype(np.uint8)
+
+    # Keep only the samples that change the motor state
+    changed = np.ones(len(times), dtype=bool)
+    changed[0] = on[0]
+    changed[1:] = (on[1:] != on[:-1]) | (on[1:] & ((duty[1:] != duty[:-1]) | (freq[1:] != freq[:-1])))
+    return times[changed], on[changed], duty[changed], freq[changed]
+
+
+def _compile_key(signals, luts):
+    """Identity of what compile_actuator_events depends on, frozen tracks compared by identity."""
+    clips = tuple(
+        (signal["start_time"], signal["stop_time"], signal.get("layer", 0), signal.get("blend"),
+         id(signal.get("low_freq")), id(signal.get("high_freq")), id(signal.get("duty")), id(signal.get("freq_index")))
+        for signal in signals
+    )
+    if luts is not None:
+        luts = (luts[0].tobytes(), luts[1].tobytes())
+    return clips, luts
+
+
+class PlaybackEngine:
+    """
+    Heap-based scheduler over the compiled design.
+    Events are returned as (actuator_id, duty, freq, start_or_stop) tuples.
+
+    In loop mode the engine wraps from the end of the loop region back to its start by itself:
+    the caller keeps feeding a monotonic clock, the compiled events are reused on every iteration
+    and at the wrap only the actuators whose state differs between the end and the start of the
+    region receive a command.
+    """
+
+    def __init__(self, control_rate=DEFAULT_CONTROL_RATE):
+        self.control_rate = control_rate
+        self.tracks = {}  # actuator_id -> (times, on, duty, freq)
+        self.compiled = {}  # actuator_id -> (compile key, signals, events) reused by the next load
+        self.cursors = {}  # actuator_id -> index of the next event to emit
+        self.heap = []  # (next event time, actuator_id)
+        self.duration = 0.0
+        self.loop_region = None  # None (no loop) or (start, stop), stop None meaning the end of the design
+        self.loop = None  # Effective (start, stop) of the current load, see loop_bounds
+        self.loop_start_cursors = {}  # actuator_id -> cursor at the loop start, reused on every wrap
+        self.offset = 0.0  # Caller clock minus design time, grows by the loop length on every wrap
+
+    def load(self, actuator_signals, calibration_luts=None):
+        """
+        Compile a design ({actuator_id: [signal, ...]}) into per-actuator event lists.
+        calibration_luts ({actuator_id: (duty_lut, frequency_lut)}) replaces the default mapping.
+        Actuators whose clips and calibration did not change since the last load keep their events,
+        so resuming after a pause does not recompile the design.
+        """
+        self.tracks = {}
+        self.duration = 0.0
+        calibration_luts = calibration_luts or {}
+        compiled = {}
+        for actuator_id, signals in actuator_signals.items():
+            luts = calibration_luts.get(actuator_id)
+            key = _compile_key(signals, luts)
+            cached = self.compiled.get(actuator_id)
+            if cached is not None and cached[0] == key:
+                events = cached[2]
+            else:
+                events = compile_actuator_events(signals, self.control_rate, luts)
+            # The signals are kept with the key so the ids of their tracks stay valid
+            compiled[actuator_id] = (key, signals, events)
+            if events is not None:
+                self.tracks[actuator_id] = events
+                self.duration = max(self.duration, float(events[0][-1]))
+        self.compiled = compiled
+        self.cursors = {}
+        self.heap = []
+        self.set_loop(self.loop_region)
+
+    def set_control_rate(self, control_rate):
+        """Change the sampling rate of the clip envelopes, every actuator is recompiled on the next load."""
+        if control_rate != self.control_rate:
+            self.control_rate = control_rate
+            self.compiled = {}
+
+    def set_loop(self, region):
+        """
+        Loop over region ((start, stop) in design time, stop None for the end of the design), or stop
+        looping with None. Takes effect on the next seek.
+        """
+        self.loop_region = region
+        self.loop = None
+        if region is not None:
+            start, stop = region
+            stop = self.duration if stop is None else min(stop, self.duration)
+            start = max(0.0, start)
+            if stop > start:
+                self.loop = (start, stop)
+        self.loop_start_cursors = {}
+        if self.loop is not None:
+            for actuator_id, (times, _, _, _) in self.tracks.items():
+                self.loop_start_cursors[actuator_id] = int(np.searchsorted(times, self.loop[0], side='right'))
+
+    def design_time(self, time_position):
+        """Design time matching a time of the caller clock (they only differ once a loop wrapped)."""
+        design_time = time_position - self.offset
+        if self.loop is not None and self.offset > 0 and design_time < self.loop[0]:
+            # The wrap happened ahead of this time (lookahead), it is still in the previous iteration
+            design_time += self.loop[1] - self.loop[0]
+        return design_time
+
+    def seek(self, time_position):
+        """
+        Position every actuator at time_position without replaying anything before it: one binary
+        search per actuator over its compiled state changes. When looping, a position past the loop
+        end is folded back into the loop region.
+        Returns the target motor state {actuator_id: (duty, freq)} of the running actuators, to be
+        diffed against what the motors are actually doing (HapticCommandManager.apply_state).
+        """
+        self.offset = 0.0
+        if self.loop is not None and time_position >= self.loop[1]:
+            start, stop = self.loop
+            self.offset = time_position - (start + (time_position - start) % (stop - start))
+        design_time = time_position - self.offset
+        self.cursors = {
+            actuator_id: int(np.searchsorted(times, design_time, side='right'))
+            for actuator_id, (times, _, _, _) in self.tracks.items()
+        }
+        self.rebuild_heap()
+        return {
+            actuator_id: state
+            for actuator_id in self.tracks
+            if (state := self.current_state(actuator_id)) is not None
+        }
+
+    def current_state(self, actuator_id):
+        """(duty, freq) set by the last emitted event of the actuator, None when it is silent."""
+        times, on, duty, freq = self.tracks[actuator_id]
+        last = self.cursors[actuator_id] - 1
+        if last < 0 or not on[last]:
+            return None
+        return int(duty[last]), int(freq[last])
+
+    def rebuild_heap(self):
+        self.heap = []
+        for actuator_id, cursor in self.cursors.items():
+            times = self.tracks[actuator_id][0]
+            if cursor < len(times) and self.in_iteration(times[cursor]):
+                self.heap.append((float(times[cursor]), actuator_id))
+        heapq.heapify(self.heap)
+
+    def in_iteration(self, event_time):
+        """Events at or after the loop end belong to nobody: the wrap replaces them."""
+        return self.loop is None or event_time < self.loop[1]
+
+    def next_deadline(self):
+        """Caller clock time of the earliest pending state change or loop wrap, or None when nothing is left."""
+        if self.loop is not None:
+            wrap = self.loop[1]
+            return (min(self.heap[0][0], wrap) if self.heap else wrap) + self.offset
+        return self.heap[0][0] + self.offset if self.heap else None
+
+    def pop_due(self, time_position):
+        """Return every event scheduled at or before time_position (caller clock), advancing the heap."""
+        due = {}
+        while True:
+            design_time = time_position - self.offset + TIME_EPSILON
+            while self.heap and self.heap[0][0] <= design_time:
+                _, actuator_id = heapq.heappop(self.heap)
+                times, on, duty, freq = self.tracks[actuator_id]
+                cursor = self.cursors[actuator_id]
+                # Collapse several overdue events of the same actuator into the latest one
+                while cursor < len(times) and times[cursor] <= design_time and self.in_iteration(times[cursor]):
+                    cursor += 1
+                last = cursor - 1
+                due[actuator_id] = (actuator_id, int(duty[last]), int(freq[last]), int(on[last]))
+                self.cursors[actuator_id] = cursor
+                if cursor < len(times) and self.in_iteration(times[cursor]):
+                    heapq.heappush(self.heap, (float(times[cursor]), actuator_id))
+            if self.loop is None or design_time < self.loop[1]:
+                return list(due.values())
+            self.wrap(due)
+
+    def wrap(self, due):
+        """Jump from the loop end back to its start, adding to due the actuators whose state changes."""
+        start, stop = self.loop
+        for actuator_id in self.tracks:
+            state_at_end = self.current_state(actuator_id)
+            self.cursors[actuator_id] = self.loop_start_cursors[actuator_id]
+            state_at_start = self.current_state(actuator_id)
+            if state_at_start != state_at_end:
+                duty, freq = state_at_start if state_at_start is not None else (0, 0)
+                due[actuator_id] = (actuator_id, duty, freq, int(state_at_start is not None))
+        self.offset += stop - start
+        self.rebuild_heap()
@@ -0,0 +1,191 @@
+'''
+Real-time playback worker.
+
+Runs the whole playback pipeline (event scheduling, command building and the blocking BLE write)
+on its own QThread, from an immutable snapshot of the design taken when play is pressed.
+The haptic side runs at the engine control rate (up to MAX_CONTROL_RATE), independently of the
+GUI: the worker publishes an immutable PlaybackState after every change and the GUI reads the
+latest one on its own frame clock. Replacing the state is a single reference assignment, so
+neither side ever waits for the other, and redraws, dialogs or window resizes no longer delay
+the haptic output.
+
+Commands are sent `lookahead` seconds before their timeline time to compensate the pipeline
+latency (timer wake-up, command building and BLE write). The lookahead is either set by the
+user or follows the measured latency of the last writes.
+'''
+
+from collections import deque, namedtuple
+from time import perf_counter
+import numpy as np
+from PyQt6.QtCore import QObject, QTimer, Qt, pyqtSignal, pyqtSlot
+
+from playback_engine import PlaybackEngine, MAX_CONTROL_RATE
+from timeline_timer import TimelineTimer
+
+# What the GUI needs to draw playback: the timeline time at perf_counter() == timestamp (it keeps
+# advancing while playing, wrapping inside the loop region when loop is a (start, stop) tuple)
+# and the frozenset of actuator ids that are currently running
+PlaybackState = namedtuple("PlaybackState", "playing time_position timestamp active loop")
+
+
+class PlaybackWorker(QObject):
+    playback_finished = pyqtSignal()  # The end of the design was reached
+    latency_updated = pyqtSignal(float, float)  # measured pipeline latency, applied lookahead (seconds)
+
+    LATENCY_WINDOW = 50  # Number of recent sends used for the latency estimate
+    MAX_LOOKAHEAD = 0.25  # Upper bound for the automatic lookahead (seconds)
+
+    def __init__(self, haptic_manager, parent=None):
+        super().__init__(parent)
+        self.haptic_manager = haptic_manager
+        self.engine = PlaybackEngine()
+        self.playing = False
+        self.state = PlaybackState(False, 0.0, perf_counter(), frozenset(), None)  # Read by the GUI, never mutated
+        self.clock_jitter = None  # TimelineTimer.jitter_stats() of the last finished playback, replaced, never mutated
+
+        # Latency compensation
+        self.auto_lookahead = True
+        self.manual_lookahead = 0.0
+        self.lookahead = 0.0
+        self.wake_target = 0.0  # Timeline time (minus lookahead) the event timer was aimed at
+        self.latency_samples = deque(maxlen=self.LATENCY_WINDOW)
+        self.published_latency = None
+
+        # Wakes up exactly at the next actuator state change
+        self.event_timer = QTimer(self)
+        self.event_timer.setSingleShot(True)
+        self.event_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.event_timer.timeout.connect(self.fire_due_events)
+
+        # Playback clock: timeline time is read from it, its ticks detect the end of the design
+        self.timeline_timer = TimelineTimer()
+        self.timeline_timer.setParent(self)
+        self.timeline_timer.time_updated.connect(self.check_progress)
+
+    @pyqtSlot(object, object, float)
+    def play(self, snapshot, calibration_luts, time_position):
+        """Compile the snapshot with the calibration lookup arrays and start playing from time_position."""
+        self.engine.load(snapshot, calibration_luts)
+        self.playing = True
+        self.haptic_manager.start_playback()
+        self.update_lookahead()
+        self.timeline_timer.reset_stats()
+        self.seek(time_position)
+
+    @pyqtSlot(float)
+    def seek(self, time_position):
+        """Jump to time_position while playing: rebuild the motor state there and send only the difference."""
+        if not self.playing:
+            return
+        self.event_timer.stop()
+        self.timeline_timer.manual_update(time_position)
+        self.timeline_timer.play()
+        self.haptic_manager.apply_state(self.engine.seek(time_position + self.lookahead))
+        self.publish_state()
+        self.schedule_next_event()
+
+    @pyqtSlot(object, object, float)
+    def preview(self, snapshot, calibration_luts, time_position):
+        """Scrub preview while stopped: hold the motor state of time_position until stop() is called."""
+        if self.playing:
+            return
+        self.engine.load(snapshot, calibration_luts)
+        self.haptic_manager.start_playback()
+        self.haptic_manager.apply_state(self.engine.seek(time_position))
+        self.publish_state()
+
+    @pyqtSlot()
+    def stop(self):
+        """Stop playback and silence every running actuator."""
+        if self.playing:
+            self.clock_jitter = self.timeline_timer.jitter_stats()
+        self.playing = False
+        self.event_timer.stop()
+        self.timeline_timer.pause()
+        self.haptic_manager.stop_playback()
+        self.publish_state()
+
+    @pyqtSlot(object)
+    def set_loop(self, region):
+        """Loop over region ((start, stop), stop None for the whole design) or stop looping (None)."""
+        if not self.playing:
+            self.engine.set_loop(region)
+            return
+        # Position in the design under the current loop (its offset), before the region changes
+        design_time = self.engine.design_time(self.timeline_time())
+        self.engine.set_loop(region)
+        self.seek(design_time)
+
+    @pyqtSlot(int)
+    def set_control_rate(self, control_rate):
+        """Rate at which clip envelopes are turned into motor commands, applied from the next play."""
+        self.engine.set_control_rate(min(max(1, control_rate), MAX_CONTROL_RATE))
+
+    @pyqtSlot(bool, float)
+    def set_latency_compensation(self, auto, lookahead):
+        """Follow the measured latency (auto) or use a fixed lookahead in seconds."""
+        self.auto_lookahead = auto
+        self.manual_lookahead = max(0.0, lookahead)
+        self.update_lookahead()
+        self.publish_latency(force=True)
+
+    def measured_latency(self):
+        """Median delay between the intended wake-up and the end of the BLE write."""
+        return float(np.median(self.latency_samples)) if self.latency_samples else 0.0
+
+    def update_lookahead(self):
+        if self.auto_lookahead:
+            self.lookahead = min(self.measured_latency(), self.MAX_LOOKAHEAD)
+        else:
+            self.lookahead = self.manual_lookahead
+
+    def timeline_time(self):
+        return self.timeline_timer.now()
+
+    def schedule_next_event(self):
+        """Sleep until `lookahead` before the earliest actuator state change of the compiled design."""
+        deadline = self.engine.next_deadline()
+        if deadline is None or not self.playing:
+            return
+        self.wake_target = deadline - self.lookahead
+        delay = self.wake_target - self.timeline_time()
+        self.event_timer.start(max(0, int(np.ceil(delay * 1000))))
+
+    @pyqtSlot()
+    def fire_due_events(self):
+        """Send exactly the commands that became due (sampled at t + lookahead) and schedule the next wake-up."""
+        if not self.playing:
+            return
+        events = self.engine.pop_due(self.timeline_time() + self.lookahead)
+        if events:
+            self.haptic_manager.dispatch_events(events)
+            self.publish_state()
+            # Everything between the intended wake-up and the end of the write is pipeline latency
+            self.latency_samples.append(max(0.0, self.timeline_time() - self.wake_target))
+        self.schedule_next_event()
+
+    @pyqtSlot(float)
+    def check_progress(self, current_time):
+        """Called on every clock tick: refresh the latency estimate and stop at the end of the design."""
+        if not self.playing:
+            return
+        self.update_lookahead()
+        self.publish_latency()
+        if self.engine.loop is None and current_time >= self.engine.duration:
+            self.stop()
+            self.state = PlaybackState(False, self.engine.duration, perf_counter(), frozenset(), None)
+            self.playback_finished.emit()
+
+    def publish_state(self):
+        """Replace the shared PlaybackState (one atomic reference assignment, no lock needed)."""
+        self.state = PlaybackState(
+            self.playing, self.engine.design_time(self.timeline_time()), perf_counter(),
+            frozenset(self.haptic_manager.active_actuators), self.engine.loop
+        )
+
+    def publish_latency(self, force=False):
+        """Emit the latency estimate when it moved by at least a millisecond."""
+        latency = self.measured_latency()
+        if force or self.published_latency is None or abs(latency - self.published_latency) >= 0.001:
+            self.published_latency = latency
+            self.latency_updated.emit(latency, self.lookahead)
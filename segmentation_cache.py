@@ -0,0 +1,57 @@
+'''
+Memoized segmentation results.
+
+Dropping the same library signal on several actuators used to run the whole segmentation once
+per drop. The cache keys each result by a hash of the sample buffer and the segmentation
+parameters, and evicts the least recently used results once the cached tracks exceed a sample
+budget. A hit returns the very same tracks (high_freq, low_freq and their quantized duty and
+freq_index) that were stored, so the clips created from one signal share their tracks: clip edits always slice new lists (see
+TimelineCanvas.replace_overlap), the cached lists are never modified in place.
+'''
+
+from collections import OrderedDict
+import hashlib
+
+import numpy as np
+
+from signal_precision import dtype_of
+
+# Total number of cached track values (all tracks of a result) before the oldest results are evicted
+MAX_CACHED_SAMPLES = 20_000_000
+
+
+def signal_digest(signal_data):
+    """Fast content hash of a sample buffer (list or array), as float64 bytes or float32 bytes for float32 arrays."""
+    samples = np.ascontiguousarray(signal_data, dtype=dtype_of(signal_data))
+    return hashlib.blake2b(samples.tobytes(), digest_size=16).digest()
+
+
+class SegmentationCache:
+    def __init__(self, max_samples=MAX_CACHED_SAMPLES):
+        self.max_samples = max_samples
+        self.entries = OrderedDict()  # key -> tuple of tracks, most recently used last
+        self.cached_samples = 0
+
+    def key(self, signal_data, *parameters):
+        """Cache key of a buffer segmented with the given parameters (rates, threshold, mode...)."""
+        return (signal_digest(signal_data), len(signal_data)) + tuple(parameters)
+
+    def get(self, key):
+        tracks = self.entries.get(key)
+        if tracks is None:
+            return None
+        self.entries.move_to_end(key)
+        return tracks
+
+    def put(self, key, tracks):
+        size = sum(len(track) for track in tracks)
+        if size > self.max_samples:
+            return tracks  # Larger than the whole budget, not worth evicting everything else
+        if key in self.entries:
+            self.cached_samples -= sum(len(track) for track in self.entries.pop(key))
+        self.entries[key] = tracks
+        self.cached_samples += size
+        while self.cached_samples > self.max_samples:
+            _, evicted = self.entries.popitem(last=False)
+            self.cached_samples -= sum(len(track) for track in evicted)
+        return tracks
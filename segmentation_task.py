@@ -0,0 +1,89 @@
+'''
+Segmentation of dropped signals on the application QThreadPool.
+
+The drop inserts the clip right away with silent placeholder tracks (marked with a "pending"
+task id) and a SegmentationTask computes the real tracks in the background. The task reports
+its progress and can be cancelled between its steps; the GUI thread receives the result through
+queued signals and fills in every clip still carrying the task id (see
+Haptics_App.segmentation_finished).
+'''
+
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+from utils import TIME_STAMP
+from signal_precision import dtype_of, to_storage, storage_precision
+from clip_tracks import TRACK_RATE, quantize_tracks
+
+
+class SegmentationCancelled(Exception):
+    pass
+
+
+def segment_tracks(segmentation_api, signal_data, mode, multirate, progress=None):
+    """
+    Split a 44.1 kHz signal into its frequency and intensity tracks (arrays at TRACK_RATE, float32
+    for a float32 signal). progress(fraction) is called between steps and may raise SegmentationCancelled.
+    """
+    report = progress or (lambda fraction: None)
+    dtype = dtype_of(signal_data)
+    if multirate:
+        # The signal is already in memory, so the in-memory pipeline is used whatever its length
+        # (signal_segmentation_stream is for sources that arrive block by block)
+        high_freq_signal, low_freq_signal = segmentation_api.signal_segmentation_multirate(
+            product_signal=signal_data, sampling_rate=TIME_STAMP, downsample_rate=TRACK_RATE, mode=mode,
+            progress=lambda fraction: report(0.9 * fraction)
+        )
+        report(0.9)
+        return high_freq_signal.astype(dtype, copy=False), low_freq_signal.astype(dtype, copy=False)
+    high_freq_signal, low_freq_signal = segmentation_api.signal_segmentation(
+        product_signal=signal_data, sampling_rate=TIME_STAMP, downsample_rate=TRACK_RATE, mode=mode,
+        progress=lambda fraction: report(0.9 * fraction)
+    )
+    report(0.9)
+    return high_freq_signal, low_freq_signal
+
+
+class SegmentationTaskSignals(QObject):
+    progress = pyqtSignal(str, int)  # task id, percent
+    finished = pyqtSignal(str, object)  # task id, (high_freq, low_freq, duty, freq_index), see SegmentationTask.run
+    cancelled = pyqtSignal(str)
+    failed = pyqtSignal(str, str)
+
+
+class SegmentationTask(QRunnable):
+    """Segments one signal; the signal list is only read, never modified."""
+
+    def __init__(self, task_id, segmentation_api, signal_data, mode, multirate):
+        super().__init__()
+        self.task_id = task_id
+        self.segmentation_api = segmentation_api
+        self.signal_data = signal_data
+        self.mode = mode
+        self.multirate = multirate
+        self.cancel_requested = False
+        self.signals = SegmentationTaskSignals()
+
+    def cancel(self):
+        """Stop at the next progress step (a flag, read by the worker thread)."""
+        self.cancel_requested = True
+
+    def report(self, fraction):
+        if self.cancel_requested:
+            raise SegmentationCancelled()
+        self.signals.progress.emit(self.task_id, int(100 * min(max(fraction, 0.0), 1.0)))
+
+    def run(self):
+        try:
+            self.report(0.0)
+            high_freq_signal, low_freq_signal = segment_tracks(
+                self.segmentation_api, self.signal_data, self.mode, self.multirate, self.report)
+            precision = storage_precision(self.signal_data)  # Tracks are stored like the samples
+            tracks = (to_storage(high_freq_signal, precision), to_storage(low_freq_signal, precision),
+                      *quantize_tracks(high_freq_signal, low_freq_signal))
+            self.report(1.0)
+        except SegmentationCancelled:
+            self.signals.cancelled.emit(self.task_id)
+        except Exception as e:
+            self.signals.failed.emit(self.task_id, str(e))
+        else:
+            self.signals.finished.emit(self.task_id, tracks)
@@ -0,0 +1,48 @@
+'''
+Sample precision of the signal pipeline.
+
+Double precision (the default) keeps samples and envelope tracks as Python float lists, the way
+designs have always stored them. Single precision keeps them as float32 NumPy arrays from the
+moment a signal is generated or imported: signal_segmentation_api then works in float32 with
+complex64 transforms, the tracks stay float32 arrays in the clips and the timelines are drawn
+from float32 buffers. The motors only receive a 4-bit duty and a 3-bit frequency, so single
+precision halves the memory and bandwidth of the pipeline without any audible or tactile change.
+The precision travels with the data: clips created in either mode can coexist in one design.
+'''
+
+import numpy as np
+
+PRECISION_DOUBLE = "double"
+PRECISION_SINGLE = "single"
+
+SAMPLE_DTYPES = {PRECISION_DOUBLE: np.float64, PRECISION_SINGLE: np.float32}
+
+
+def sample_dtype(precision):
+    return SAMPLE_DTYPES[precision]
+
+
+def dtype_of(samples):
+    """Precision samples are computed in: float32 for float32 arrays, float64 for anything else."""
+    if isinstance(samples, np.ndarray) and samples.dtype == np.float32:
+        return np.float32
+    return np.float64
+
+
+def to_storage(samples, precision):
+    """Samples or a track in the form a clip stores it: a float list (double) or a float32 array (single)."""
+    if precision == PRECISION_SINGLE:
+        return np.asarray(samples, dtype=np.float32)
+    return np.asarray(samples, dtype=np.float64).tolist()
+
+
+def storage_precision(samples):
+    """Precision of stored samples, so results derived from them are stored the same way."""
+    return PRECISION_SINGLE if dtype_of(samples) == np.float32 else PRECISION_DOUBLE
+
+
+def placeholder_track(length, precision):
+    """Silent track of a clip whose segmentation is still running."""
+    if precision == PRECISION_SINGLE:
+        return np.zeros(length, dtype=np.float32)
+    return [0.0] * length
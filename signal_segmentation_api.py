@@ -1,14 +1,48 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.fft import fft, fftfreq
-from scipy.signal import stft
-from scipy.signal import hilbert
+from scipy.signal import resample_poly, firwin, upfirdn
+from scipy.fft import rfft, irfft, rfftfreq, ifft, next_fast_len
+from math import gcd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from playback_engine import FREQUENCY_SET
+from signal_precision import dtype_of
 
 DOMINANT_CUTOFF = 110
 
+# Frequency tracking modes of signal_segmentation
+MODE_STFT = "stft"  # Full STFT, argmax over every bin
+MODE_GOERTZEL = "goertzel"  # Only the eight hardware frequencies (plus low-frequency probes), see goertzel_bank
+SEGMENTATION_MODES = (MODE_STFT, MODE_GOERTZEL)
+
+# Rate of the multi-rate pipeline analysis, above the 384 Hz top actuator frequency
+ANALYSIS_RATE = 1000
+
+# Input block size of the streaming segmentation (samples), bounds its memory use
+STREAM_CHUNK_SIZE = 1 << 16
+# Taps of the streaming envelope low-pass (at the analysis rate)
+ENVELOPE_FILTER_TAPS = 101
+
+# Frames analyzed per matrix product in goertzel_bank, bounds the temporary memory
+GOERTZEL_BLOCK_FRAMES = 256
+# Frames transformed per batched FFT in frame_dominant_frequency
+FFT_BLOCK_FRAMES = 256
+# Mirrored margin of the padded transforms, in periods of the lowest frequency of interest
+FFT_MARGIN_PERIODS = 10
+# Threads of the scipy.fft transforms (-1: every core)
+DEFAULT_FFT_WORKERS = -1
+
+
+def scaled_progress(progress, start, stop):
+    """Progress callback reporting a step's own [0, 1] progress as [start, stop] of progress (None stays None)."""
+    if progress is None:
+        return None
+    return lambda fraction: progress(start + (stop - start) * fraction)
+
+
 class signal_segmentation_api:
-    def __init__(self):
-        pass
+    def __init__(self, fft_workers=DEFAULT_FFT_WORKERS):
+        self.fft_workers = fft_workers  # Threads used by every FFT of the segmentation
 
     '''
     the function takes in a high sample rate produce signal, extract high frequency components using STFT, and extract low frequency components using Hilbert transform
@@ -16,7 +50,7 @@ class signal_segmentation_api:
         product_signal: the input signal with very high sample rate
         sample_rate: the sample rate of the input signal, e.g., 44100 Hz
         downsample_rate: the expected output sample rate for vibration commands,, e.g., 200 Hz
-    Output: 
+    Output (both at downsample_rate: ceil(len * downsample_rate / sample_rate) values, value j at time j / downsample_rate):
         high_freq_signal: a numpy array of the high frequency components (range [100, 400]), used for setting the frequency of vibration commands (find the nearest frequency out of the eight options)
         low_freq_signal: a numpy array of the low frequency components (range [0, 1]), used for setting the intensity of vibration commands (map to [0, 15])
     '''
@@ -36,46 +70,240 @@ class signal_segmentation_api:
     #     return high_freq_signal, low_freq_signal
 
 
-    def signal_segmentation(self, product_signal, sampling_rate, downsample_rate, threshold=102):
-        # Perform STFT on the signal to get the high-frequency components
-        frequencies, times, Zxx = stft(product_signal, fs=sampling_rate, nperseg=int(20*sampling_rate/downsample_rate), noverlap=int(19*sampling_rate/downsample_rate))
-        max_freq = np.argmax(np.abs(Zxx), axis=0)
-        high_freq_signal = frequencies[max_freq][:-1]
-
-        # Perform Hilbert transform on the signal to get the low-frequency components
-        analytic_signal = hilbert(product_signal)
-        amplitude_envelope = np.abs(analytic_signal)
-
-        # Perform FFT on the envelope to get frequency components
-        fft_envelope = fft(amplitude_envelope)
-        fft_freq_env = fftfreq(len(fft_envelope), 1 / sampling_rate)
-
-        # Use median frequency instead of max to compare with the threshold
-        median_frequency = np.median(high_freq_signal)
-        if median_frequency < threshold:
+    def goertzel_bank(self, product_signal, sampling_rate, downsample_rate, frequencies, progress=None):
+        '''
+        Magnitude of the given frequencies for every STFT frame (same Hann window, frame length, hop
+        and zero padding as the STFT in signal_segmentation), i.e. a bank of Goertzel filters.
+        Frames are projected on the cos/sin bases of the requested frequencies only, block by block,
+        instead of computing every FFT bin. Returns an array of shape (n_frames, len(frequencies)).
+        '''
+        return self.frame_magnitudes(self.stft_frames(product_signal, sampling_rate, downsample_rate), sampling_rate, frequencies, progress)
+
+    def stft_frames(self, product_signal, sampling_rate, downsample_rate):
+        '''
+        Frames (n_frames, nperseg) of the signal_segmentation STFT, as a strided view: same length,
+        hop and zero padding as scipy.signal.stft(boundary='zeros', padded=True).
+        '''
+        nperseg = int(20*sampling_rate/downsample_rate)
+        hop = nperseg - int(19*sampling_rate/downsample_rate)
+        dtype = dtype_of(product_signal)
+        signal = np.asarray(product_signal, dtype=dtype)
+
+        signal = np.concatenate([np.zeros(nperseg // 2, dtype), signal, np.zeros(nperseg // 2, dtype)])
+        n_frames = int(np.ceil(max(len(signal) - nperseg, 0) / hop)) + 1
+        signal = np.concatenate([signal, np.zeros((n_frames - 1) * hop + nperseg - len(signal), dtype)])
+        return sliding_window_view(signal, nperseg)[::hop]
+
+    def fft_extension(self, signal, margin):
+        '''
+        Signal mirrored by at least margin samples on both sides, up to a fast FFT length, so the
+        circular wrap of the transforms falls outside the signal. Returns (extended, offset).
+        '''
+        n = len(signal)
+        margin = min(margin, n - 1)
+        if margin <= 0:
+            return signal, 0
+        n_fft = next_fast_len(n + 2 * margin, real=True)
+        right = n_fft - n - margin
+        if right >= n:  # Too short to mirror that far, plain zero padding
+            return np.pad(signal, (margin, right)), margin
+        return np.pad(signal, (margin, right), mode='reflect'), margin
+
+    def analytic_envelope(self, signal, margin):
+        '''
+        |hilbert(signal)| through one real FFT, the one-sided spectrum doubled and one complex
+        inverse FFT, on the signal extended to a fast length (see fft_extension).
+        '''
+        n = len(signal)
+        extended, offset = self.fft_extension(signal, margin)
+        n_fft = len(extended)
+        spectrum = rfft(extended, workers=self.fft_workers)
+        analytic_spectrum = np.zeros(n_fft, dtype=spectrum.dtype)
+        analytic_spectrum[:len(spectrum)] = spectrum
+        analytic_spectrum[1:(n_fft + 1) // 2] *= 2  # Positive frequencies doubled, Nyquist (even n_fft) kept
+        return np.abs(ifft(analytic_spectrum, workers=self.fft_workers)[offset:offset + n])
+
+    def lowpass(self, signal, sampling_rate, cutoff):
+        '''Brickwall low-pass through a real FFT of the signal extended to a fast length (see fft_extension).'''
+        n = len(signal)
+        extended, offset = self.fft_extension(signal, int(FFT_MARGIN_PERIODS * sampling_rate / max(cutoff, 1)))
+        spectrum = rfft(extended, workers=self.fft_workers)
+        spectrum[rfftfreq(len(extended), 1 / sampling_rate) > cutoff] = 0
+        return irfft(spectrum, len(extended), workers=self.fft_workers)[offset:offset + n]
+
+    def frame_magnitudes(self, frames, sampling_rate, frequencies, progress=None):
+        '''
+        Goertzel bank over frames of shape (n_frames, nperseg): Hann windowed magnitude of each frequency.
+        progress(fraction) is called after every block of frames (and may raise to abort).
+        '''
+        n_frames, nperseg = frames.shape
+        window = 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(nperseg) / nperseg)  # Periodic Hann
+        phase = 2 * np.pi * np.outer(np.arange(nperseg), frequencies) / sampling_rate
+        basis = np.concatenate([window[:, None] * np.cos(phase), window[:, None] * np.sin(phase)], axis=1).astype(frames.dtype)
+
+        magnitudes = np.empty((n_frames, len(frequencies)), dtype=frames.dtype)
+        for start in range(0, n_frames, GOERTZEL_BLOCK_FRAMES):
+            projection = frames[start:start + GOERTZEL_BLOCK_FRAMES] @ basis
+            magnitudes[start:start + GOERTZEL_BLOCK_FRAMES] = np.hypot(projection[:, :len(frequencies)], projection[:, len(frequencies):])
+            if progress:
+                progress(min(start + GOERTZEL_BLOCK_FRAMES, n_frames) / n_frames)
+        return magnitudes
+
+    def frame_dominant_frequency(self, frames, sampling_rate, threshold=102, mode=MODE_STFT, progress=None):
+        '''
+        Dominant frequency of every frame (n_frames, nperseg) with a Hann window.
+        Returns (frequency track, dominant frequency used for the low-frequency decision): in STFT mode
+        both are the strongest real-FFT bin, in Goertzel mode the track is the strongest hardware
+        frequency and the decision also sees probe bins every 10 Hz below threshold.
+        progress(fraction) is called after every block of frames (and may raise to abort).
+        '''
+        nperseg = frames.shape[1]
+        if mode == MODE_GOERTZEL:
+            probes = np.arange(0, threshold, 10, dtype=np.float64)
+            candidates = np.concatenate([probes, FREQUENCY_SET])
+            magnitudes = self.frame_magnitudes(frames, sampling_rate, candidates, progress)
+            return FREQUENCY_SET[np.argmax(magnitudes[:, len(probes):], axis=1)], candidates[np.argmax(magnitudes, axis=1)]
+        window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(nperseg) / nperseg)).astype(frames.dtype)
+        # The frame length fixes the bins, so frames are not padded; batches bound the temporary memory
+        peak_bins = np.empty(len(frames), dtype=np.intp)
+        for start in range(0, len(frames), FFT_BLOCK_FRAMES):
+            spectra = rfft(frames[start:start + FFT_BLOCK_FRAMES] * window, axis=1, workers=self.fft_workers)
+            peak_bins[start:start + FFT_BLOCK_FRAMES] = np.argmax(np.abs(spectra), axis=1)
+            if progress:
+                progress(min(start + FFT_BLOCK_FRAMES, len(frames)) / len(frames))
+        dominant = rfftfreq(nperseg, 1 / sampling_rate)[peak_bins]
+        return dominant, dominant
+
+    def dominant_frequency_index(self, product_signal, sampling_rate, downsample_rate, threshold=102, progress=None):
+        '''
+        Goertzel mode: index (0..7) of the strongest hardware frequency for every frame, and whether
+        the signal is dominated by content below threshold. The latter is judged like the STFT mode
+        (median of the per-frame dominant frequency), with probe bins every 10 Hz below threshold.
+        '''
+        probes = np.arange(0, threshold, 10, dtype=np.float64)
+        magnitudes = self.goertzel_bank(product_signal, sampling_rate, downsample_rate, np.concatenate([probes, FREQUENCY_SET]), progress)
+        dominant = np.concatenate([probes, FREQUENCY_SET])[np.argmax(magnitudes, axis=1)]
+        is_low_frequency = np.median(dominant) < threshold
+        return np.argmax(magnitudes[:, len(probes):], axis=1), is_low_frequency
+
+    def signal_segmentation(self, product_signal, sampling_rate, downsample_rate, threshold=102, mode=MODE_STFT, progress=None):
+        # progress(fraction) is called during the analysis and may raise to abort it
+        if mode == MODE_GOERTZEL:
+            # Only evaluate the frequencies the actuators can play
+            dominant_index, is_low_frequency = self.dominant_frequency_index(
+                product_signal, sampling_rate, downsample_rate, threshold, scaled_progress(progress, 0.0, 0.5))
+            high_freq_signal = FREQUENCY_SET[dominant_index][:-1]
+        else:
+            # STFT of the signal (real FFT of every Hann frame) to get the high-frequency components
+            high_freq_signal, _ = self.frame_dominant_frequency(self.stft_frames(product_signal, sampling_rate, downsample_rate), sampling_rate, threshold,
+                                                                progress=scaled_progress(progress, 0.0, 0.5))
+            high_freq_signal = high_freq_signal[:-1]
+            # Use median frequency instead of max to compare with the threshold
+            is_low_frequency = np.median(high_freq_signal) < threshold
+
+        # Signal samples at the output times (j * sampling_rate) // downsample_rate
+        n_out = int(np.ceil(len(product_signal) * downsample_rate / sampling_rate))
+        output_samples = (np.arange(n_out) * int(sampling_rate)) // int(downsample_rate)
+
+        if is_low_frequency:
             # Set low frequency signal to the original and high frequency to zeros
-            low_freq_signal = np.abs(product_signal)
-            high_freq_signal = np.zeros_like(product_signal)
+            low_freq_signal = np.abs(np.asarray(product_signal)[output_samples])
+            high_freq_signal = np.zeros(n_out)
         else:
-            # Filter out frequency components above downsample_rate/2 and IFFT back to time domain
-            fft_envelope_filtered = fft_envelope.copy()
-            fft_envelope_filtered[(fft_freq_env > downsample_rate//2)] = 0
-            fft_envelope_filtered[(fft_freq_env < -downsample_rate//2)] = 0
-            filtered_signal = np.real(np.fft.ifft(fft_envelope_filtered))
+            # Hilbert envelope of the signal, low-passed at downsample_rate/2
+            signal = np.asarray(product_signal, dtype=dtype_of(product_signal))
+            if progress:
+                progress(0.5)
+            envelope = self.analytic_envelope(signal, int(FFT_MARGIN_PERIODS * sampling_rate / (downsample_rate // 2)))
+            if progress:
+                progress(0.75)
+            filtered_signal = self.lowpass(envelope, sampling_rate, downsample_rate // 2)
+
+            # Clamp the low frequency signal between 0 and 1, read at the output times
+            low_freq_signal = np.clip(filtered_signal[output_samples], 0, 1)
+
+            # Frame track spread linearly over the signal, read at the output times
+            high_freq_signal = np.interp(output_samples, np.linspace(0, len(product_signal)-1, len(high_freq_signal)), high_freq_signal)
+
+        # Ensure the return types are NumPy arrays (float32 for a float32 input)
+        dtype = dtype_of(product_signal)
+        high_freq_signal = np.asarray(high_freq_signal, dtype=dtype)
+        low_freq_signal = np.asarray(low_freq_signal, dtype=dtype)
 
-            # Clamp the low frequency signal between 0 and 1
-            low_freq_signal = np.clip(filtered_signal, 0, 1)
+        return high_freq_signal, low_freq_signal
 
-            # Upsample both signals to match the original signal length using cubic interpolation
-            high_freq_signal = np.interp(np.arange(len(product_signal)), np.linspace(0, len(product_signal)-1, len(high_freq_signal)), high_freq_signal)
-            low_freq_signal = np.interp(np.arange(len(product_signal)), np.linspace(0, len(product_signal)-1, len(low_freq_signal)), low_freq_signal)
 
-        # Ensure the return types are NumPy arrays
-        high_freq_signal = np.array(high_freq_signal)
-        low_freq_signal = np.array(low_freq_signal)
-
-        return high_freq_signal, low_freq_signal
 
+    def signal_segmentation_multirate(self, product_signal, sampling_rate, downsample_rate, threshold=102, mode=MODE_STFT, analysis_rate=ANALYSIS_RATE, progress=None):
+        '''
+        Multi-rate version of signal_segmentation. The signal is decimated once with a polyphase
+        anti-alias filter to analysis_rate, the dominant frequency (real FFT frames, or the Goertzel
+        bank) and the envelope are computed at that rate, and both tracks are returned directly at
+        downsample_rate (one value every 1/downsample_rate s) instead of the input rate.
+        The envelope is sqrt(2 * lowpass(x^2)), which equals the Hilbert envelope for a carrier
+        above downsample_rate/2 and only needs the decimated square of the signal.
+        Frequency content above analysis_rate/2 is removed by the anti-alias filter.
+        progress(fraction) is called during the analysis and may raise to abort it.
+        '''
+        dtype = dtype_of(product_signal)
+        signal = np.asarray(product_signal, dtype=dtype)
+        sampling_rate = int(sampling_rate)
+        # Keep a whole number of analysis samples per output sample
+        analysis_rate = int(downsample_rate * np.ceil(analysis_rate / downsample_rate))
+        hop = analysis_rate // int(downsample_rate)
+        nperseg = int(20*analysis_rate/downsample_rate)
+        divisor = gcd(analysis_rate, sampling_rate)
+        up, down = analysis_rate // divisor, sampling_rate // divisor
+        n_out = int(np.ceil(len(signal) * downsample_rate / sampling_rate))
+        if n_out == 0:
+            return np.zeros(0, dtype), np.zeros(0, dtype)
+
+        decimated = resample_poly(signal, up, down)
+        if progress:
+            progress(0.3)
+
+        # Dominant frequency of Hann frames centered on every output sample
+        padded = np.concatenate([np.zeros(nperseg // 2, dtype), decimated, np.zeros(n_out * hop + nperseg, dtype)])
+        frames = sliding_window_view(padded, nperseg)[::hop][:n_out]
+        high_freq_signal, dominant = self.frame_dominant_frequency(frames, analysis_rate, threshold, mode, scaled_progress(progress, 0.3, 0.6))
+        is_low_frequency = np.median(dominant) < threshold
+
+        if is_low_frequency:
+            # Same as the full-rate pipeline: rectified signal as intensity, no frequency
+            low_freq_signal = np.abs(signal[(np.arange(n_out) * sampling_rate) // int(downsample_rate)])
+            high_freq_signal = np.zeros(n_out)
+        else:
+            # Envelope from the decimated power, low-passed at downsample_rate/2 with real FFTs
+            power = resample_poly(signal ** 2, up, down)
+            if progress:
+                progress(0.9)
+            envelope = np.sqrt(np.clip(2 * self.lowpass(power, analysis_rate, downsample_rate // 2), 0, None))
+            envelope = np.concatenate([envelope, np.full(max(0, n_out * hop - len(envelope)), envelope[-1] if len(envelope) else 0.0)])
+            low_freq_signal = np.clip(envelope[::hop][:n_out], 0, 1)
+
+        return np.asarray(high_freq_signal, dtype=dtype), np.asarray(low_freq_signal, dtype=dtype)
+
+    def signal_segmentation_stream(self, chunks, sampling_rate, downsample_rate, threshold=102, mode=MODE_STFT, analysis_rate=ANALYSIS_RATE):
+        '''
+        Block-streaming version of signal_segmentation_multirate: chunks is any iterable of sample
+        blocks (see iter_chunks), and (high_freq, low_freq) control-rate blocks are yielded as soon
+        as they are final. Memory is bounded by the chunk size and the filter lengths, never by the
+        signal length. The low-frequency decision is taken per output block instead of over the
+        whole signal.
+        '''
+        segmenter = StreamingSegmenter(self, sampling_rate, downsample_rate, threshold, mode, analysis_rate)
+        for chunk in chunks:
+            high_freq_signal, low_freq_signal = segmenter.feed(chunk)
+            if len(high_freq_signal):
+                yield high_freq_signal, low_freq_signal
+        high_freq_signal, low_freq_signal = segmenter.flush()
+        if len(high_freq_signal):
+            yield high_freq_signal, low_freq_signal
+
+    def iter_chunks(self, product_signal, chunk_size=STREAM_CHUNK_SIZE):
+        '''Split a list or array into float64 blocks without converting it as a whole.'''
+        for start in range(0, len(product_signal), chunk_size):
+            yield np.asarray(product_signal[start:start + chunk_size], dtype=np.float64)
 
 
     # def signal_segmentation(self, product_signal, sampling_rate, downsample_rate):
@@ -148,6 +376,151 @@ class signal_segmentation_api:
     #     return high_freq_signal, low_freq_signal
 
 
+class PolyphaseDecimator:
+    '''
+    Streaming equivalent of scipy.signal.resample_poly(x, up, down) with its default Kaiser FIR:
+    y[m] = sum_n x[n] h[half_len + m*down - n*up]. Only the input samples still needed by the
+    next outputs are kept between calls, and every call filters them with one upfirdn (overlap-save).
+    '''
+
+    def __init__(self, up, down):
+        self.up, self.down = up, down
+        self.half_len = 10 * max(up, down)
+        self.h = firwin(2 * self.half_len + 1, 1.0 / max(up, down), window=('kaiser', 5.0)) * up
+        self.buffer = np.zeros(0)
+        self.buffer_start = 0  # Global index of buffer[0]
+        self.n_input = 0
+        self.next_output = 0
+
+    def first_input(self, m):
+        return -((self.half_len - m * self.down) // self.up)  # ceil((m*down - half_len) / up)
+
+    def feed(self, chunk, final=False):
+        '''Add input samples and return the outputs that no longer depend on future input.'''
+        self.buffer = np.concatenate([self.buffer, np.asarray(chunk, dtype=np.float64)])
+        self.n_input += len(chunk)
+        if final:
+            stop = -(-self.n_input * self.up // self.down)  # ceil, same length as resample_poly
+        else:
+            # Last input of output m is floor((m*down + half_len) / up), it must already be there
+            stop = max(self.next_output, ((self.n_input - 1) * self.up - self.half_len) // self.down + 1)
+        outputs = self.compute(self.next_output, stop)
+        self.next_output = stop
+
+        # Drop the input no later output needs
+        keep_from = max(0, min(self.first_input(self.next_output), self.n_input)) - self.buffer_start
+        if keep_from > 0:
+            self.buffer = self.buffer[keep_from:]
+            self.buffer_start += keep_from
+        return outputs
+
+    def compute(self, m_start, m_stop):
+        '''Outputs m_start to m_stop from the buffered input.'''
+        if m_stop <= m_start:
+            return np.zeros(0)
+        # upfirdn(h, buffer, up, down)[j] = sum_i buffer[i] h[j*down - i*up]: delay h by shift so
+        # that output m_start falls on a whole j (its filter offset is then a multiple of down)
+        offset = self.half_len + m_start * self.down - self.buffer_start * self.up
+        shift = -offset % self.down
+        first = (offset + shift) // self.down
+        filtered = upfirdn(np.concatenate([np.zeros(shift), self.h]), self.buffer, self.up, self.down)
+        outputs = filtered[first:first + m_stop - m_start]
+        # Trailing outputs past the end of the filtered input (final flush) are zero
+        return np.pad(outputs, (0, m_stop - m_start - len(outputs)))
+
+
+class StreamingSegmenter:
+    '''
+    State of signal_segmentation_api.signal_segmentation_stream: two polyphase decimators (signal
+    and signal^2) carried across chunks, the decimated signal kept only as far back as the next
+    STFT frame needs, and the decimated power kept as far back as the envelope low-pass needs
+    (overlap-save: each block is filtered together with the tail of the previous one).
+    '''
+
+    def __init__(self, api, sampling_rate, downsample_rate, threshold=102, mode=MODE_STFT, analysis_rate=ANALYSIS_RATE):
+        self.api = api
+        self.sampling_rate = int(sampling_rate)
+        self.downsample_rate = int(downsample_rate)
+        self.threshold = threshold
+        self.mode = mode
+        self.analysis_rate = int(downsample_rate * np.ceil(analysis_rate / downsample_rate))
+        self.hop = self.analysis_rate // self.downsample_rate
+        self.nperseg = int(20*self.analysis_rate/downsample_rate)
+        divisor = gcd(self.analysis_rate, self.sampling_rate)
+        up, down = self.analysis_rate // divisor, self.sampling_rate // divisor
+        self.signal_decimator = PolyphaseDecimator(up, down)
+        self.power_decimator = PolyphaseDecimator(up, down)
+        self.envelope_filter = firwin(ENVELOPE_FILTER_TAPS, self.downsample_rate // 2, fs=self.analysis_rate)
+        self.filter_delay = ENVELOPE_FILTER_TAPS // 2
+
+        self.decimated = np.zeros(0)  # Decimated signal from global index decimated_start
+        self.decimated_start = 0
+        self.power = np.zeros(0)  # Decimated power from global index power_start
+        self.power_start = 0
+        self.raw_points = []  # |x| at the output sample times, for low-frequency blocks
+        self.n_input = 0
+        self.next_output = 0
+
+    def feed(self, chunk, final=False):
+        chunk = np.asarray(chunk, dtype=np.float64)
+        # Input samples falling on an output time ((j * fs) // rate)
+        first = -(-self.n_input * self.downsample_rate // self.sampling_rate)
+        last = -(-(self.n_input + len(chunk)) * self.downsample_rate // self.sampling_rate)
+        indices = (np.arange(first, last) * self.sampling_rate) // self.downsample_rate - self.n_input
+        self.raw_points.extend(np.abs(chunk[indices[indices < len(chunk)]]))
+        self.n_input += len(chunk)
+
+        self.decimated = np.concatenate([self.decimated, self.signal_decimator.feed(chunk, final)])
+        self.power = np.concatenate([self.power, self.power_decimator.feed(chunk ** 2, final)])
+        n_decimated = self.decimated_start + len(self.decimated)
+        n_power = self.power_start + len(self.power)
+
+        if final:
+            stop = -(-self.n_input * self.downsample_rate // self.sampling_rate)
+        else:
+            # Output j needs its whole frame and the envelope filter support around j*hop
+            stop = min(
+                (n_decimated - (self.nperseg - self.nperseg // 2)) // self.hop + 1,
+                (n_power - self.filter_delay - 1) // self.hop + 1,
+                self.next_output + len(self.raw_points),
+            )
+        if stop <= self.next_output:
+            return np.zeros(0), np.zeros(0)
+        outputs = np.arange(self.next_output, stop)
+
+        # Frames centered on every output sample, zeros outside of the signal
+        frame_index = (outputs * self.hop - self.nperseg // 2)[:, None] + np.arange(self.nperseg)
+        frames = self.gather(self.decimated, self.decimated_start, n_decimated, frame_index)
+        high_freq_signal, dominant = self.api.frame_dominant_frequency(frames, self.analysis_rate, self.threshold, self.mode)
+
+        if np.median(dominant) < self.threshold:
+            low_freq_signal = np.array(self.raw_points[:len(outputs)])
+            high_freq_signal = np.zeros(len(outputs))
+        else:
+            filter_index = (outputs * self.hop - self.filter_delay)[:, None] + np.arange(ENVELOPE_FILTER_TAPS)
+            filtered = self.gather(self.power, self.power_start, n_power, filter_index) @ self.envelope_filter
+            low_freq_signal = np.clip(np.sqrt(np.clip(2 * filtered, 0, None)), 0, 1)
+
+        # Forget what the next outputs no longer need
+        del self.raw_points[:len(outputs)]
+        self.next_output = stop
+        keep = max(0, stop * self.hop - self.nperseg // 2 - self.decimated_start)
+        self.decimated, self.decimated_start = self.decimated[keep:], self.decimated_start + keep
+        keep = max(0, stop * self.hop - self.filter_delay - self.power_start)
+        self.power, self.power_start = self.power[keep:], self.power_start + keep
+        return np.asarray(high_freq_signal, dtype=np.float64), low_freq_signal
+
+    def flush(self):
+        '''End of the input: return every remaining output.'''
+        return self.feed(np.zeros(0), final=True)
+
+    def gather(self, buffer, buffer_start, buffer_stop, index):
+        valid = (index >= 0) & (index < buffer_stop)
+        if not len(buffer):
+            return np.zeros(index.shape)
+        return np.where(valid, buffer[np.clip(index - buffer_start, 0, len(buffer) - 1)], 0.0)
+
+
 # Example usage
 if __name__ == '__main__':
     wav_filename = 'square5_sine200.wav'
@@ -167,9 +540,8 @@ if __name__ == '__main__':
 
     # Perform signal segmentation
     downsample_rate = 200
-    downsample_t = np.linspace(0, duration, len(product_signal), endpoint=False)
-    
     high_freq_signal, low_freq_signal = signal_segmentation.signal_segmentation(product_signal, sampling_rate, downsample_rate)
+    downsample_t = np.arange(len(high_freq_signal)) / downsample_rate
     print(len(downsample_t), len(high_freq_signal), len(low_freq_signal))
 
     # Plot the high frequency signal
@@ -1,61 +1,90 @@
-from PyQt6.QtCore import QThread, QObject, pyqtSignal, QTimer
+from collections import deque
+from PyQt6.QtCore import QThread, QObject, pyqtSignal, pyqtSlot, QTimer, Qt
 from PyQt6.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget
 from time import perf_counter
+import statistics
 
 class TimelineTimer(QObject):
     # Signals to communicate with other components
-    time_updated = pyqtSignal(float)  # Emitted every 5 ms with the updated current time
+    time_updated = pyqtSignal(float)  # Emitted every update_interval ms with the updated current time
+
+    JITTER_WINDOW = 1000  # Number of recent tick intervals kept for the jitter statistics
 
     def __init__(self):
         super().__init__()
         self.playing = False  # Indicates whether the timer is playing or paused
-        self.current_time = 0.0  # Keeps track of the timeline's current time
+        self.current_time = 0.0  # Timeline time of the last tick (or of the pause/seek position)
         self.update_interval = 20  # 20 ms interval in milliseconds
-        self.last_lapse = -1
+        self.start_timestamp = None  # perf_counter() value corresponding to timeline time 0 while playing
+        self.last_tick = None
         self.update_count = 0
+        self.tick_intervals = deque(maxlen=self.JITTER_WINDOW)
 
-        # Create a QTimer
-        self.timer = QTimer()
+        # Create a QTimer (child of this object, so moveToThread also moves the timer)
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
         self.timer.setInterval(self.update_interval)
         self.timer.timeout.connect(self.update)
         self.timer.start()
 
+    def now(self):
+        """Timeline time right now, computed from the absolute start timestamp (no accumulated error)."""
+        if self.playing:
+            return perf_counter() - self.start_timestamp
+        return self.current_time
+
+    @pyqtSlot()
     def update(self):
         """Update the current time and emit the time_updated signal."""
         if self.playing:
-            current_lapse = perf_counter()
-            time_lapse = current_lapse - self.last_lapse
-            # if time_lapse > self.update_interval / 1000.0:
-            self.current_time += time_lapse
-            self.current_time = round(self.current_time, 6)
-            print(self.update_count, self.current_time)
+            tick = perf_counter()
+            if self.last_tick is not None:
+                self.tick_intervals.append(tick - self.last_tick)
+            self.last_tick = tick
             self.update_count += 1
-            self.last_lapse = current_lapse
+            self.current_time = tick - self.start_timestamp
             self.time_updated.emit(self.current_time)
 
     def play(self):
         """Start progressing the timeline forward."""
+        self.start_timestamp = perf_counter() - self.current_time
         self.playing = True
-        self.last_lapse = perf_counter()
+        self.last_tick = None  # The jump of a seek is not a tick interval
+
+    def reset_stats(self):
+        """Start new jitter statistics (at the start of a playback, not on seeks)."""
         self.update_count = 0
-        # self.timer.start()
+        self.tick_intervals.clear()
 
     def pause(self):
         """Pause the timeline."""
+        self.current_time = self.now()
         self.playing = False
-        self.last_lapse = -1
 
     def reset(self):
         """Reset the timeline to the initial state."""
         self.playing = False
         self.current_time = 0.0
-        self.last_lapse = -1
 
     def manual_update(self, current_time):
         """Manually update the timeline's current time."""
         self.playing = False
         self.current_time = current_time
-        self.last_lapse = -1
+
+    def jitter_stats(self):
+        """
+        Tick interval statistics since the last reset_stats, in milliseconds:
+        number of ticks, mean interval, standard deviation and the largest deviation from update_interval.
+        """
+        intervals = [interval * 1000 for interval in self.tick_intervals]
+        if not intervals:
+            return {"ticks": self.update_count, "mean": 0.0, "stdev": 0.0, "max_deviation": 0.0}
+        return {
+            "ticks": self.update_count,
+            "mean": statistics.fmean(intervals),
+            "stdev": statistics.pstdev(intervals),
+            "max_deviation": max(abs(interval - self.update_interval) for interval in intervals),
+        }
 
 
 class MainWindow(QMainWindow):